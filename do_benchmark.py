@@ -0,0 +1,86 @@
+import os
+import json
+import shutil
+import tempfile
+import argparse
+import platform
+import subprocess
+
+from hydra import initialize_config_dir, compose
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_cars", "-n", type=int, nargs="+", default=[10, 30, 50],
+                        help="Number of cars to sweep")
+    parser.add_argument("--durations", "-d", type=float, nargs="+", default=[60., 300.],
+                        help="Durations of collection (simulation seconds) to sweep")
+    parser.add_argument("--output", "-o", type=str, default="benchmark.json",
+                        help="Path to json result")
+    parser.add_argument("--config_dir", "-c", type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "conf"),
+                        help="Path to conf folder")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also measure peak memory of each stage (slower)")
+    parser.add_argument("--stand_in", action="store_true",
+                        help="Run on in-process carla stand-in instead of carla server")
+    parser.add_argument("overrides", nargs="*",
+                        help="Hydra overrides applied to all runs, e.g. map=town03")
+    args = parser.parse_args()
+    return args
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = get_args()
+    if args.stand_in:
+        import stand_in
+        stand_in.install()
+    from benchmark.pipeline import run_pipeline, get_sweep_overrides
+
+    # nothing is written outside a temporary data folder, map is extracted in each run
+    data_folder = tempfile.mkdtemp(prefix="obp_bench_data_")
+    base_overrides = ["simulation=sync", "visual=False", "save_data=True", "storage.writer.streaming=False",
+                      "storage.writer.checkpoint_interval=0", f"data_folder={data_folder}", "map_cache_folder=null"]
+    results = []
+    try:
+        for sweep_overrides in get_sweep_overrides(args.num_cars, args.durations):
+            overrides = base_overrides + list(args.overrides) + sweep_overrides
+            with initialize_config_dir(config_dir=os.path.abspath(args.config_dir), version_base=None):
+                config = compose(config_name="config", overrides=overrides)
+
+            print("running:", " ".join(sweep_overrides))
+            result = run_pipeline(config, trace_memory=args.memory)
+            result["overrides"] = overrides
+            results.append(result)
+            print(f"ticks/s: {result['ticks_per_second']:.1f}, "
+                  f"sample p50/p99: {result['stages']['sample']['p50_ms']:.3f}/"
+                  f"{result['stages']['sample']['p99_ms']:.3f}ms, "
+                  f"save: {result['stages']['save']['total_s']:.2f}s")
+    finally:
+        shutil.rmtree(data_folder, ignore_errors=True)
+
+    report = {
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stand_in": args.stand_in,
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print("saved benchmark to", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 import argparse
 
 from convertor.convert_to_argoverse import ConvertToArgoverse
+from convertor.constants import MAX_WORKERS
+from common.timing import TIMINGS
 
 
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--data_folder", "-f", type=str, required=True,
                         help="Path to data folder")
+    parser.add_argument("--format", type=str, default="csv",
+                        choices=["csv", "npz", "parquet", "feather"],
+                        help="Format of converted scenes")
+    parser.add_argument("--images", type=str, default=None,
+                        choices=["jpeg", "png", "npz"],
+                        help="Also rasterize converted scenes in this format, see do_rasterize.py")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Number of worker processes, each converts one batch, or a range of its scenes, at a time")
     args = parser.parse_args()
     return args
 
@@ -15,8 +25,14 @@ def main():
     args = get_args()
 
     print("converting:", args.data_folder)
-    convertor = ConvertToArgoverse(data_folder=args.data_folder)
+    convertor = ConvertToArgoverse(
+        data_folder=args.data_folder,
+        file_format=args.format,
+        image_format=args.images,
+        max_workers=args.workers
+    )
     convertor.convert()
+    TIMINGS.print_summary()
 
 
 if __name__ == "__main__":
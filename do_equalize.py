@@ -2,6 +2,7 @@ import argparse
 
 from stats.equalizer import Equalizer
 from stats.statistics import Statistics
+from common.timing import TIMINGS
 
 
 def get_args():
@@ -24,6 +25,7 @@ def main():
     equalizer.run(save_folder=args.save_folder)
 
     stats = Statistics(dynamics_folder=args.save_folder)
+    TIMINGS.print_summary()
     stats.plot_stats()
 
 
@@ -0,0 +1,43 @@
+import os
+import argparse
+from omegaconf import OmegaConf
+
+from collection.orchestrator import Orchestrator
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", "-j", type=str, required=True,
+                        help="Path to jobs file, e.g. conf/jobs/jobs01.yaml")
+    parser.add_argument("--config_dir", "-c", type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "conf"),
+                        help="Path to conf folder")
+    parser.add_argument("--retries", "-r", type=int, default=2,
+                        help="Number of retries of a failed job")
+    parser.add_argument("--stand_in", action="store_true",
+                        help="Run on in-process carla stand-in instead of carla servers")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+
+    jobs_config = OmegaConf.to_container(OmegaConf.load(args.jobs), resolve=True)
+    print("jobs:", args.jobs)
+    orchestrator = Orchestrator(
+        jobs=jobs_config["jobs"],
+        config_dir=args.config_dir,
+        max_retries=args.retries,
+        overrides=jobs_config.get("overrides"),
+        stand_in=args.stand_in
+    )
+    results = orchestrator.run()
+
+    for i, result in enumerate(results):
+        status = "failed" if result["error"] is not None else "done"
+        print(f"job {i} {status} after {result['attempts']} attempt(s): {result['batch_folder']}")
+
+
+if __name__ == "__main__":
+    main()
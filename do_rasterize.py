@@ -0,0 +1,35 @@
+import argparse
+
+from visual.raster.scene import rasterize_scenes, IMAGE_FORMATS
+from common.timing import TIMINGS
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_folder", "-f", type=str, required=True,
+                        help="Path to data folder, containing all_batches of converted scenes")
+    parser.add_argument("--resolution", type=float, default=0.2,
+                        help="Meters per pixel")
+    parser.add_argument("--size", type=int, nargs=2, default=[224, 224],
+                        help="Height, width of images in pixel")
+    parser.add_argument("--format", type=str, default="jpeg", choices=IMAGE_FORMATS,
+                        help="Format of images, npz: one array per scene")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+
+    print("rasterizing:", args.data_folder)
+    rasterize_scenes(
+        all_batches_folder=f"{args.data_folder}/all_batches",
+        resolution=args.resolution,
+        size=tuple(args.size),
+        image_format=args.format
+    )
+    TIMINGS.print_summary()
+
+
+if __name__ == "__main__":
+    main()
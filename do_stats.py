@@ -1,6 +1,7 @@
 import argparse
 
 from stats.statistics import Statistics
+from common.timing import TIMINGS
 
 
 def get_args():
@@ -16,6 +17,7 @@ def main() -> None:
 
     print("data_folder:", args.data_folder)
     stats = Statistics(dynamics_folder=args.data_folder)
+    TIMINGS.print_summary()
     stats.plot_stats()
 
 
@@ -51,6 +51,16 @@ class Agent:
     def agent(self, var):
         self.behavior_agent = var
 
+    def get_control(self) -> carla.VehicleControl:
+        """
+        Returns:
+            (carla.VehicleControl): control of next step, None if agent has no behavior
+        """
+        if self.behavior_agent is None:
+            return None
+        return self.behavior_agent.run_step()
+
     def run_step(self):
-        if self.behavior_agent is not None:
-            self._actor.apply_control(self.behavior_agent.run_step())
+        control = self.get_control()
+        if control is not None:
+            self._actor.apply_control(control)
@@ -0,0 +1,203 @@
+import time
+import shutil
+import functools
+import tempfile
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+from omegaconf import DictConfig
+
+from collection.data_collection import DataCollection
+from common.timing import TIMINGS
+
+
+# per-stage peaks need tracemalloc.reset_peak(), python >= 3.9
+_HAS_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+class StageTimer:
+    """
+    Collect duration (and optionally peak memory) of each call of a stage
+    Without tracemalloc.reset_peak() (python < 3.9),
+    memory still held at the end of each call is kept instead of its peak
+    timer = StageTimer("sample")
+    with timer:
+        do_something()
+    """
+
+    def __init__(self, name: str, trace_memory: bool = False):
+        self.name = name
+        self._trace_memory = trace_memory
+        self.durations = list()
+        self.peak_memory = 0
+
+    def __enter__(self):
+        if self._trace_memory:
+            self._start_memory = tracemalloc.get_traced_memory()[0]
+            if _HAS_RESET_PEAK:
+                tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.durations.append(time.perf_counter() - self._start)
+        if self._trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            used = (peak if _HAS_RESET_PEAK else current) - self._start_memory
+            self.peak_memory = max(self.peak_memory, used)
+
+    def wrap(self, func):
+        """
+        Same function, each call measured by this timer
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+    def summary(self) -> Dict:
+        durations = np.array(self.durations) * 1000
+        if len(durations) == 0:
+            durations = np.zeros(1)
+        result = {
+            "calls": len(self.durations),
+            "total_s": float(durations.sum() / 1000),
+            "mean_ms": float(durations.mean()),
+            "p50_ms": float(np.percentile(durations, 50)),
+            "p99_ms": float(np.percentile(durations, 99)),
+            "max_ms": float(durations.max())
+        }
+        if self._trace_memory:
+            result["peak_mb"] = self.peak_memory / 2 ** 20
+        return result
+
+
+class _TimedWorld:
+    """
+    carla.World with world.tick() measured, everything else is forwarded
+    """
+
+    def __init__(self, world, timer: StageTimer):
+        self._world = world
+        self.tick = timer.wrap(world.tick)
+
+    def __getattr__(self, name):
+        return getattr(self._world, name)
+
+
+def run_pipeline(
+        config: DictConfig,
+        trace_memory: bool = False
+) -> Dict:
+    """
+    Run collection loop of synchronous mode (DataCollection._run_synchronous)
+    and measure each stage of a tick:
+        + run_step: AgentHandler.run_step
+        + tick: world.tick
+        + sample: AgentHandler.get_data_dynamic_state
+        + append: DataScene.append_dynamic_state
+    and once per run:
+        + setup: DataCollection(config), map extraction and spawning
+        + save: DataScene.save
+    Args:
+        config (DictConfig): collection config, should be in synchronous mode
+        trace_memory (bool): measure peak memory of each stage (slower)
+
+    Returns:
+        (dict): measurements of this run
+    """
+    # timings saved by DataCollection are of this run only
+    TIMINGS.reset()
+    if trace_memory:
+        tracemalloc.start()
+    timers = {
+        name: StageTimer(name, trace_memory)
+        for name in ["setup", "run_step", "tick", "sample", "append", "save"]
+    }
+
+    with timers["setup"]:
+        data_collection = DataCollection(config)
+    env = data_collection._env
+    agent_handler = data_collection.agent_handler
+    data_scene = data_collection._data_scene
+
+    # samples which produced rows, not calls: None means no new frame
+    num_samples = [0]
+    get_data_dynamic_state = timers["sample"].wrap(agent_handler.get_data_dynamic_state)
+
+    def sample(*args, **kwargs):
+        data = get_data_dynamic_state(*args, **kwargs)
+        if data is not None:
+            num_samples[0] += 1
+        return data
+
+    # timers are attached to the objects used by the loop
+    world = env.world
+    env.world = _TimedWorld(world, timers["tick"])
+    agent_handler.run_step = timers["run_step"].wrap(agent_handler.run_step)
+    agent_handler.get_data_dynamic_state = sample
+    data_scene.append_dynamic_state = timers["append"].wrap(data_scene.append_dynamic_state)
+
+    try:
+        start_sim_time = world.get_snapshot().timestamp.elapsed_seconds
+        start = time.perf_counter()
+        data_collection._run_synchronous()
+        wall_time = time.perf_counter() - start
+        sim_time = world.get_snapshot().timestamp.elapsed_seconds - start_sim_time
+    finally:
+        env.world = world
+    num_rows = len(data_scene.dynamic_state)
+    num_ticks = timers["tick"].summary()["calls"]
+
+    batch_folder = tempfile.mkdtemp(prefix="obp_bench_")
+    try:
+        with timers["save"]:
+            data_scene.save(batch_folder)
+    finally:
+        shutil.rmtree(batch_folder, ignore_errors=True)
+        data_collection.stop()
+    if trace_memory:
+        tracemalloc.stop()
+
+    return {
+        "town": config.map.town,
+        "num_car": config.traffic.num_car,
+        "num_motorbike": config.traffic.num_motorbike,
+        "duration": sim_time,
+        "ticks": num_ticks,
+        "rows": num_rows,
+        "wall_s": wall_time,
+        "ticks_per_second": num_ticks / wall_time,
+        "real_time_factor": sim_time / wall_time,
+        "sample_rate_hz": num_samples[0] / sim_time,
+        "target_rate_hz": 1. / config.storage.delta_time,
+        "stages": {
+            name: timer.summary()
+            for name, timer in timers.items()
+        }
+    }
+
+
+def get_sweep_overrides(
+        num_cars: List[int],
+        durations: List[float]
+) -> List[List[str]]:
+    """
+    Overrides for each run of sweep
+    Args:
+        num_cars (list(int)): number of cars
+        durations (list(float)): duration of collection in simulation time
+
+    Returns:
+        (list(list(str)))
+    """
+    return [
+        [
+            f"traffic.num_car={num_car}",
+            "traffic.num_motorbike=0",
+            f"storage.duration={duration}"
+        ]
+        for num_car in num_cars
+        for duration in durations
+    ]
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnBuffer:
+    """
+    Growable columnar container to capture rows tick by tick
+    Each column is a preallocated numpy array,
+    capacity grows by chunks so appending cost stays flat over a long run
+    buffer = ColumnBuffer(columns)
+    while True:
+        buffer.append(data)
+    df = buffer.to_dataframe()
+    """
+
+    def __init__(
+            self,
+            columns: list,
+            chunk_size: int = 4096
+    ):
+        """
+        Args:
+            columns (list(str)): name of columns to store
+            chunk_size (int): minimum number of rows to grow each time
+        """
+        self.columns = list(columns)
+        self._chunk_size = chunk_size
+
+        # column name -> np.ndarray
+        # dtype of each column is inferred from the first appended data
+        self._data = dict()
+        self._length = 0
+        self._capacity = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def shape(self):
+        return self._length, len(self.columns)
+
+    @staticmethod
+    def _get_dtype(values: np.ndarray):
+        # keep string/mixed data as python objects
+        if values.dtype.kind in "OUS":
+            return object
+        return values.dtype
+
+    def _grow(self, required: int):
+        """
+        Extend capacity of all columns to at least "required" rows
+        Capacity is increased geometrically (at least by chunk_size)
+        to keep amortized cost of appending constant
+        Args:
+            required (int): number of rows needed
+
+        Returns:
+            None
+        """
+        new_capacity = max(
+            required,
+            self._capacity + max(self._chunk_size, self._capacity // 2)
+        )
+        for col, arr in self._data.items():
+            new_arr = np.empty(new_capacity, dtype=arr.dtype)
+            new_arr[:self._length] = arr[:self._length]
+            self._data[col] = new_arr
+        self._capacity = new_capacity
+
+    def append(self, data):
+        """
+        Append rows to buffer
+        Args:
+            data (pd.DataFrame | dict(str, array-like)):
+                mapping from column name to values,
+                must contain all columns of buffer with the same length
+
+        Returns:
+            None
+        """
+        values = {
+            col: np.asarray(data[col])
+            for col in self.columns
+        }
+        num_row = len(values[self.columns[0]])
+        if num_row == 0:
+            return
+
+        # allocate columns on first data
+        if len(self._data) == 0:
+            self._data = {
+                col: np.empty(0, dtype=self._get_dtype(val))
+                for col, val in values.items()
+            }
+
+        end = self._length + num_row
+        if end > self._capacity:
+            self._grow(end)
+
+        for col, val in values.items():
+            self._data[col][self._length:end] = val
+        self._length = end
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Build dataframe from stored rows
+        Data is copied, buffer can be cleared and reused afterwards
+        Returns:
+            pd.DataFrame
+        """
+        if len(self._data) == 0:
+            return pd.DataFrame(columns=self.columns)
+        return pd.DataFrame({
+            col: self._data[col][:self._length].copy()
+            for col in self.columns
+        })
+
+    def clear(self):
+        """
+        Drop all rows but keep allocated memory
+        """
+        self._length = 0
@@ -1,12 +1,13 @@
-import time
-import glob
-import pandas as pd
+import os
+
 from omegaconf import DictConfig
-import concurrent.futures
 from omegaconf import OmegaConf
 
 import common.utils as utils
+from common.timing import TIMINGS
 from collection.data_scene import DataScene
+from collection.scheduler import Scheduler
+from convertor.online import OnlineConvertor
 from common.environment import Environment
 from visual.matplot.figure import Figure
 from handler.agent_handler import AgentHandler
@@ -17,15 +18,48 @@ from common.save_configs import save_config
 class DataCollection:
     def __init__(self, config: DictConfig):
         self._config = config
+        # timings of this batch only, not of previous runs in the same process
+        TIMINGS.reset()
+        # checked before connecting, a wrong sampling period is not collected for nothing
+        self._ticks_per_sample = None
+        if self._config.simulation.synchronous_mode:
+            self._ticks_per_sample = utils.get_ticks_per_sample(
+                self._config.storage.delta_time,
+                self._config.simulation.fixed_delta_seconds
+            )
         self._env = Environment(config)
 
         # data-pack to save scene
         self._data_scene = DataScene(config)
+        # checkpoint of the batch to continue, agents are respawned from it
+        self._checkpoint = None
+        if self._config.resume is not None and self._config.save_data:
+            self._checkpoint = DataScene.read_checkpoint(self._config.resume)
         # initialize
         self._init()
+        # scheduler of asynchronous mode
+        self.scheduler = None
+        # agents are spawned in asynchronous mode,
+        # then world is switched to be stepped by DataCollection
+        if self._config.simulation.synchronous_mode:
+            self._env.set_synchronous_mode()
+            self._env.world.tick()
 
-        if self._config.save_data:
+        # batch folder is allocated once, when saving
+        # or at the beginning in streaming mode
+        self._batch_folder = None
+        if self._checkpoint is not None:
+            self._resume_stream(self._config.resume)
+        elif self._config.save_data:
             self._store_static()
+            # checkpoints are written into the streamed batch
+            if self._config.storage.writer.streaming or self._config.storage.writer.checkpoint_interval > 0:
+                self._open_stream(self._config.data_folder)
+
+        # Argoverse scenes emitted while collecting
+        self._online_convertor = None
+        if self._config.save_data and self._config.convert.online:
+            self._open_online_convertor()
 
         if self._config.visual:
             self._cache_map()
@@ -33,6 +67,11 @@ class DataCollection:
         self._duration = None \
             if not self._config.save_data \
             else self._config.storage.duration + 1.  # 1s for bias
+        # only the rest of duration when resuming
+        if self._checkpoint is not None and self._checkpoint["first_timestamp"] is not None:
+            self._duration -= self._checkpoint["last_timestamp"] - self._checkpoint["first_timestamp"]
+        # collection loop ended by itself, not interrupted
+        self._finished = False
 
     def _init(self):
         # map handler
@@ -44,95 +83,184 @@ class DataCollection:
         # agent handler
         self.agent_handler = AgentHandler(
             configs=self._config,
-            world=self._env.world
+            world=self._env.world,
+            client=self._env.client if self._config.simulation.batch_control else None,
+            checkpoint_agents=self._checkpoint["agents"] if self._checkpoint is not None else None
         )
 
         # define instance to visualize
         self.viz = Figure()
 
-    def _create_threads(self, max_workers=3):
+    def _run_asynchronous(self):
         """
-        Create multi threading to:
-        - update object behaviors
-        - visualize
-        - handle storing data
-        Args:
-            max_workers (int): max number of processors
+        Collection loop in asynchronous mode
+        One scheduler runs, by priority:
+        - storing data, at every "delta_time"
+        - updating object behaviors, at every "step_period"
+        - visualizing, at every "draw_period"
         """
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as self.executor:
-            self.executor.submit(self.__update_behaviors)
-            if self._config.save_data:
-                self.executor.submit(self.__store_data_thread)
-            if self._config.visual:
-                self.executor.submit(self.__visualize)
+        self.scheduler = Scheduler()
+        if self._config.save_data:
+            self.scheduler.add_task(
+                "sample", self.__store_data,
+                period=self._config.storage.delta_time, priority=0
+            )
+        self.scheduler.add_task(
+            "step", self.agent_handler.run_step,
+            period=self._config.simulation.step_period, priority=1
+        )
+        if self._config.visual:
+            self.scheduler.add_task(
+                "draw", self.__visualize,
+                period=self._config.simulation.draw_period, priority=2
+            )
+        if self._batch_folder is not None and self._config.storage.writer.checkpoint_interval > 0:
+            self.scheduler.add_task(
+                "checkpoint", self.checkpoint,
+                period=self._config.storage.writer.checkpoint_interval, priority=3
+            )
+        self.scheduler.run(duration=self._duration)
+        print(f"schedule: {self.scheduler.summary()}")
 
     def __visualize(self):
         """
         For visualizing
         """
-        start = time.time()
-        while True:
-            self.viz.draw_dynamic([
-                agent
-                for a_type, agents in self.agent_handler.agents.items()
-                for agent in agents
-            ])
-            time.sleep(self._config.sleep)
-
-            # ignore if _duration is None
-            if self._duration is None:
-                continue
-            # else break if > _duration
-            if time.time() - start > self._duration:
-                self.viz.fig.close()
-                break
+        self.viz.draw_dynamic([
+            agent
+            for a_type, agents in self.agent_handler.agents.items()
+            for agent in agents
+        ])
 
-    def __update_behaviors(self):
+    def __store_data(self):
         """
-        For updating object behaviors
+        For store data scene
         """
-        start = time.time()
-        while True:
-            self.agent_handler.run_step()
-            time.sleep(self._config.sleep)
+        self._append_sample(self.agent_handler.get_data_dynamic_state())
 
-            # ignore if _duration is None
-            if self._duration is None:
-                continue
-            # else break if > _duration
-            if time.time() - start > self._duration:
-                break
+    def _append_sample(self, data):
+        self._data_scene.append_dynamic_state(data)
+        # after data scene, timestamps are continued when resuming
+        if self._online_convertor is not None:
+            with TIMINGS.measure("convert.online", verbose=False):
+                self._online_convertor.append(data)
 
-    def __store_data_thread(self):
+    def _run_synchronous(self):
         """
-        For store data scene
+        Collection loop in synchronous mode
+        Each world.tick() is preceded by exactly one agent step,
+        state is sampled every "delta_time" of simulation time
+        and stamped with simulation time
         """
-        start = time.time()
-        last_tick = start
+        # number of ticks between 2 consecutive samples
+        ticks_per_sample = self._ticks_per_sample
+
+        checkpoint_interval = self._config.storage.writer.checkpoint_interval
+        start = None
+        last_checkpoint = None
+        num_ticks = 0
         while True:
-            now = time.time()
-            if (now - last_tick > self._config.storage.delta_time) and self._config.save_data:
-                self._data_scene.dynamic_state = pd.concat(
-                    [self._data_scene.dynamic_state,
-                     self.agent_handler.get_data_dynamic_state()],
-                    ignore_index=True
-                )
-                last_tick = now
-            time.sleep(self._config.sleep)
+            self.agent_handler.run_step()
+            with TIMINGS.measure("world.tick", verbose=False):
+                self._env.world.tick()
+            sim_time = self._env.world.get_snapshot().timestamp.elapsed_seconds
+            if start is None:
+                start = sim_time
+
+            if num_ticks % ticks_per_sample == 0 and self._config.save_data:
+                self._append_sample(self.agent_handler.get_data_dynamic_state(timestamp=sim_time))
+            num_ticks += 1
+
+            if self._batch_folder is not None and checkpoint_interval > 0:
+                # retried at next tick if writer is busy
+                if last_checkpoint is None or sim_time - last_checkpoint >= checkpoint_interval:
+                    if self.checkpoint():
+                        last_checkpoint = sim_time
+
+            if self._config.visual:
+                self.viz.draw_dynamic([
+                    agent
+                    for a_type, agents in self.agent_handler.agents.items()
+                    for agent in agents
+                ])
 
             # ignore if _duration is None
             if self._duration is None:
                 continue
             # else break if > _duration
-            if time.time() - start > self._duration:
+            if sim_time - start > self._duration:
                 break
 
     def _store_static(self):
         # static map
         self._data_scene.static = self.map_handler.data
+        self._data_scene.lane_graph = self.map_handler.map.lane_graph
         # dynamic property
         self._data_scene.dynamic_property = self.agent_handler.get_data_dynamic_property()
 
+    def _open_stream(self, folder_path):
+        """
+        Start writing batch to disk while collecting
+        so that a partial batch is kept if run is aborted
+        """
+        batch_folder = self._get_batch_folder(folder_path)
+        self._data_scene.open(batch_folder)
+        self._save_config(batch_folder)
+        print(f"streaming data to {batch_folder}")
+
+    def _resume_stream(self, batch_folder):
+        """
+        Continue writing a batch from its checkpoint
+        """
+        self._batch_folder = batch_folder
+        self._data_scene.resume(batch_folder, self._checkpoint)
+        print(f"resuming {batch_folder} from {self._checkpoint['num_rows']} rows")
+
+    def checkpoint(self, complete=False, block=False):
+        """
+        Hand collected rows to writer and save state of agents into the batch folder,
+        so that the batch can be continued with config "resume"
+        checkpoint.json is written by the writer thread, sampling does not wait for disk
+        Args:
+            complete (bool): collection is finished
+            block (bool): wait for writer if it is busy, only at the end of collection
+
+        Returns:
+            (bool): False if writer is busy, checkpoint is not taken
+        """
+        if self._batch_folder is None or not self._data_scene.is_streaming:
+            return True
+        try:
+            agents = self.agent_handler.get_checkpoint()
+        except RuntimeError as e:
+            # server is gone, rows are still written, previous checkpoint is kept
+            print(f"state of agents is not available: {e}")
+            agents = None
+        with TIMINGS.measure("scene.checkpoint", verbose=False):
+            return self._data_scene.checkpoint(self._batch_folder, agents, complete=complete, block=block)
+
+    def _open_online_convertor(self):
+        """
+        Convert to Argoverse scenes while collecting
+        """
+        batch_folder = self._get_batch_folder(self._config.data_folder)
+        start_counter = 0
+        if self._checkpoint is not None and self._checkpoint["first_timestamp"] is not None:
+            # continue numbering of frames after checkpoint
+            duration = self._checkpoint["last_timestamp"] - self._checkpoint["first_timestamp"]
+            start_counter = int(round(duration / self._config.storage.delta_time)) + 1
+        self._online_convertor = OnlineConvertor(
+            data_folder=os.path.dirname(os.path.abspath(batch_folder)),
+            batch_name=os.path.basename(batch_folder),
+            static=self._data_scene.static,
+            dynamic_property=self._data_scene.dynamic_property,
+            lane_graph=self._data_scene.lane_graph,
+            config=OmegaConf.to_container(self._config, resolve=True),
+            max_workers=self._config.convert.workers,
+            file_format=self._config.convert.format,
+            start_counter=start_counter
+        )
+
     def _cache_map(self):
         # draw static
         self.viz.draw_static(container=self.map_handler.map.list_polyline_waypoints)
@@ -143,25 +271,71 @@ class DataCollection:
         self.viz.cache_map()
 
     def run(self):
-        # create threads
-        # to visualize,
-        # store data parallel
-        # and update obj behaviors
-        self._create_threads()
+        # in synchronous mode,
+        # one loop drives ticks, behaviors and storing data
+        if self._config.simulation.synchronous_mode:
+            self._run_synchronous()
+        else:
+            # tasks are scheduled on wall-clock time
+            self._run_asynchronous()
+        self._finished = True
+
+    def collect(self):
+        """
+        Run, stop and save data
+        If run is interrupted (SIGINT) or fails, collected data is still saved
+        as a partial batch, which can be continued with config "resume"
+        Returns:
+            (str): batch folder, None if data is not saved
+        """
+        batch_folder = None
+        try:
+            self.run()
+        finally:
+            try:
+                self.stop()
+            finally:
+                if self._config.save_data:
+                    batch_folder = self.save_data(self._config.data_folder)
+        return batch_folder
+
+    @property
+    def batch_folder(self):
+        # None until a batch is allocated
+        return self._batch_folder
+
+    def _get_batch_folder(self, folder_path):
+        if self._batch_folder is None:
+            self._batch_folder = utils.allocate_batch_folder(folder_path)
+        return self._batch_folder
+
+    def _save_config(self, batch_folder):
+        conf_dict = OmegaConf.to_container(self._config, resolve=True)
+        save_config(batch_folder, conf_dict)
 
     def save_data(self, folder_path):
         print("saving...")
-        batch_num = len(glob.glob(f"{folder_path}/*"))
-        batch_folder = f"{folder_path}/batch{batch_num:02d}"
+        batch_folder = self._get_batch_folder(folder_path)
+        if not self._finished:
+            print("collection is interrupted, saving partial batch")
 
+        # last checkpoint, to continue an interrupted batch
+        self.checkpoint(complete=self._finished, block=True)
         # save data scene
-        self._data_scene.save(batch_folder)
+        with TIMINGS.measure("scene.save", verbose=False):
+            self._data_scene.save(batch_folder)
         # save config
-        conf_dict = OmegaConf.to_container(self._config, resolve=True)
-        save_config(batch_folder, conf_dict)
+        self._save_config(batch_folder)
+        # save where time went, next to config
+        TIMINGS.save(batch_folder)
         print(f"saved data to {batch_folder}")
+        return batch_folder
 
     def stop(self):
-        # shutdown executor
-        self.executor.shutdown()
+        # wait for scenes being converted
+        if self._online_convertor is not None:
+            self._online_convertor.close()
+            self._online_convertor = None
+        # let server run by itself again
+        self._env.restore_settings()
         self.viz.close()
@@ -1,29 +1,214 @@
 import os.path
+import json
+import functools
 
+import numpy as np
 import pandas as pd
 
+from collection.buffer import ColumnBuffer
+from collection.writer import StreamWriter
+from common.table_io import write_table, read_table, find_table
+from common.timing import timeit
+
 
 class DataScene:
     def __init__(self, config):
+        self._writer_config = config.storage.writer
+        # csv, npz, parquet or feather
+        self._format = config.storage.writer.format
         # data-frame to store static object
         self.static = pd.DataFrame(
             columns=config.storage.static.columns
         )
+        # lane graph of static map, see maps.lane_graph.LaneGraph
+        self.lane_graph = None
         # data-frame to store properties of dynamic object
         self.dynamic_property = pd.DataFrame(
             columns=config.storage.dynamic_property.columns
         )
-        # data-frame to store state of dynamic object in each tick
-        self.dynamic_state = pd.DataFrame(
+        # column buffer to store state of dynamic object in each tick
+        # converted to data-frame only once when saving
+        self.dynamic_state = ColumnBuffer(
             columns=config.storage.dynamic_state.columns
         )
+        # background writer, only used in streaming mode
+        self._writer = None
+        self._delta_time = config.storage.delta_time
+
+        # timeline of appended rows
+        self.first_timestamp = None
+        self.last_timestamp = None
+        # rows on disk before this run, when resuming a batch
+        self._num_resumed_rows = 0
+        # shift of timestamps so that resumed rows follow the checkpoint
+        self._resume_timestamp = None
+        self._time_offset = None
+
+    @property
+    def is_streaming(self) -> bool:
+        return self._writer is not None
+
+    def open(self, folder_path, write_static=True):
+        """
+        Start streaming mode
+        static and dynamic_property are written right away,
+        dynamic_state is flushed to folder_path chunk by chunk while collecting
+        Args:
+            folder_path (str): batch folder
+            write_static (bool): False when continuing a batch, files are kept
+
+        Returns:
+            None
+        """
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        if write_static:
+            self._save_static(folder_path)
+        self._writer = StreamWriter(
+            file_path=f"{folder_path}/dynamic_state",
+            queue_size=self._writer_config.queue_size,
+            file_format=self._format
+        )
+
+    @timeit("scene.append")
+    def append_dynamic_state(self, data):
+        """
+        Add rows of dynamic state
+        In streaming mode, rows are handed to writer
+        once buffer reaches chunk_size
+        Args:
+            data (pd.DataFrame | dict(str, np.ndarray)): rows of dynamic state,
+                None is ignored (no new frame)
+
+        Returns:
+            None
+        """
+        if data is None:
+            return
+        if "timestamp" in self.dynamic_state.columns:
+            self._update_timeline(data)
+        self.dynamic_state.append(data)
+        if not self.is_streaming:
+            return
+        # writer is busy, keep rows in buffer and retry next time
+        if len(self.dynamic_state) < self._writer_config.chunk_size or self._writer.full():
+            return
+        if self._writer.write(self.dynamic_state.to_dataframe()):
+            self.dynamic_state.clear()
+
+    def _update_timeline(self, data):
+        timestamp = np.asarray(data["timestamp"])
+        if len(timestamp) == 0:
+            return
+        if self._resume_timestamp is not None:
+            # first resumed sample comes one delta_time after the checkpoint
+            if self._time_offset is None:
+                self._time_offset = self._resume_timestamp + self._delta_time - timestamp[0]
+            timestamp = timestamp + self._time_offset
+            data["timestamp"] = timestamp
+        if self.first_timestamp is None:
+            self.first_timestamp = float(timestamp[0])
+        self.last_timestamp = float(timestamp[-1])
+
+    def checkpoint(self, folder_path, agents, complete=False, block=False) -> bool:
+        """
+        Streaming mode only
+        Hand collected rows to writer, checkpoint.json describing what is on disk
+        is written by the writer thread once they are written, so the caller never waits for disk
+        Rows after the checkpoint are dropped when resuming
+        Args:
+            folder_path (str): batch folder
+            agents (list(dict)): state of agents to respawn them, see AgentHandler.get_checkpoint(),
+                if None, rows are written and previous checkpoint is kept
+            complete (bool): collection is finished
+            block (bool): wait for a free slot if writer queue is full, e.g. at the end of collection
+
+        Returns:
+            (bool): False if writer queue is full, nothing is taken, checkpoint should be retried later
+        """
+        on_written = None
+        if agents is not None:
+            # state at the last collected row, rows are on disk when checkpoint is written
+            state = {
+                "complete": complete,
+                "first_timestamp": self.first_timestamp,
+                "last_timestamp": self.last_timestamp,
+                "agents": agents
+            }
+            on_written = functools.partial(self._write_checkpoint, folder_path, state)
+        data = self.dynamic_state.to_dataframe()
+        if block:
+            self._writer.write_blocking(data, on_written)
+        elif not self._writer.write(data, on_written):
+            return False
+        self.dynamic_state.clear()
+        return True
+
+    def _write_checkpoint(self, folder_path, state, num_rows, position):
+        # in writer thread, see StreamWriter.write()
+        checkpoint = {
+            "complete": state["complete"],
+            "num_rows": self._num_resumed_rows + num_rows,
+            # see StreamWriter.position
+            "state_position": position,
+            "first_timestamp": state["first_timestamp"],
+            "last_timestamp": state["last_timestamp"],
+            "agents": state["agents"]
+        }
+        # replace atomically, a crash keeps the previous checkpoint
+        tmp_path = f"{folder_path}/checkpoint.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=4)
+        os.replace(tmp_path, f"{folder_path}/checkpoint.json")
+
+    @staticmethod
+    def read_checkpoint(folder_path) -> dict:
+        with open(f"{folder_path}/checkpoint.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def resume(self, folder_path, checkpoint):
+        """
+        Continue streaming into a batch from its checkpoint
+        Rows written after the checkpoint are dropped, so that
+        the timeline continues from the state agents are respawned in
+        Args:
+            folder_path (str): batch folder
+            checkpoint (dict): see read_checkpoint()
+
+        Returns:
+            None
+        """
+        StreamWriter.truncate(f"{folder_path}/dynamic_state", checkpoint["state_position"], self._format)
+        self.static = read_table(find_table(folder_path, "static"))
+        self.dynamic_property = read_table(find_table(folder_path, "dynamic_property"))
+        self._num_resumed_rows = checkpoint["num_rows"]
+        self.first_timestamp = checkpoint["first_timestamp"]
+        self.last_timestamp = checkpoint["last_timestamp"]
+        self._resume_timestamp = checkpoint["last_timestamp"]
+        self.open(folder_path, write_static=False)
+
+    def _save_static(self, folder_path):
+        write_table(self.static, f"{folder_path}/static", self._format)
+        if self.lane_graph is not None:
+            self.lane_graph.save(folder_path)
+        write_table(self.dynamic_property, f"{folder_path}/dynamic_property", self._format)
 
     def save(self, folder_path):
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
-        self.static.to_csv(f"{folder_path}/static.csv", index=False)
-        self.dynamic_property.to_csv(f"{folder_path}/dynamic_property.csv", index=False)
-        self.dynamic_state.to_csv(f"{folder_path}/dynamic_state.csv", index=False)
+
+        if self.is_streaming:
+            # flush the rest and wait for writer
+            self._writer.write_blocking(self.dynamic_state.to_dataframe())
+            self._writer.close()
+            num_state = self._num_resumed_rows + self._writer.num_rows
+            self.dynamic_state.clear()
+            self._writer = None
+        else:
+            self._save_static(folder_path)
+            write_table(self.dynamic_state.to_dataframe(), f"{folder_path}/dynamic_state", self._format)
+            num_state = len(self.dynamic_state)
+
         print("static", self.static.shape)
         print("dyn_prop", self.dynamic_property.shape)
-        print("dyn_stat", self.dynamic_state.shape)
+        print("dyn_stat", (num_state, len(self.dynamic_state.columns)))
@@ -0,0 +1,205 @@
+import os
+import shutil
+import multiprocessing
+import threading
+import traceback
+from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+
+from hydra import initialize_config_dir, compose
+
+
+def get_overrides(job: Dict) -> List[str]:
+    """
+    Convert a job to hydra overrides
+    Args:
+        job (dict): should contain
+            + town (str): option in conf/map, e.g. town01
+            + traffic (str): option in conf/traffic
+            + storage (str): option in conf/storage
+            + port (int): port of carla server
+            + host (str): optional, host of carla server
+            + overrides (list(str)): optional, extra hydra overrides
+
+    Returns:
+        (list(str))
+    """
+    overrides = [
+        f"map={job['town']}",
+        f"traffic={job['traffic']}",
+        f"storage={job['storage']}",
+        f"connection.port={job['port']}"
+    ]
+    if "host" in job:
+        overrides.append(f"connection.host={job['host']}")
+    overrides += list(job.get("overrides", []))
+    return overrides
+
+
+class JobError(Exception):
+    """
+    Failure of a job, with the batch folder its attempt was writing into
+    """
+
+    def __init__(self, message: str, batch_folder: str = None):
+        # both in args, so that it is pickled back from the job process
+        super().__init__(message, batch_folder)
+        self.batch_folder = batch_folder
+
+    def __str__(self):
+        return self.args[0]
+
+
+def run_job(
+        config_dir: str,
+        overrides: List[str],
+        stand_in: bool = False,
+        resume: str = None
+) -> str:
+    """
+    Run one collection job, executed in its own process
+    Args:
+        config_dir (str): absolute path to conf folder
+        overrides (list(str)): hydra overrides of this job
+        stand_in (bool): use in-process carla stand-in instead of a server
+        resume (str): batch folder of a failed attempt to continue from its checkpoint
+
+    Returns:
+        (str): batch folder, None if data is not saved
+
+    Raises:
+        JobError: with the batch folder allocated by the failed attempt, if any
+    """
+    if stand_in:
+        import stand_in as carla_stand_in
+        carla_stand_in.install()
+    # import here so that carla is only loaded in worker process
+    from collection.data_collection import DataCollection
+
+    if resume is not None:
+        overrides = overrides + [f"resume={resume}"]
+    with initialize_config_dir(config_dir=config_dir, version_base=None):
+        config = compose(config_name="config", overrides=overrides)
+
+    data_collection = None
+    try:
+        data_collection = DataCollection(config)
+        return data_collection.collect()
+    except Exception as e:
+        batch_folder = data_collection.batch_folder if data_collection is not None else resume
+        raise JobError(f"{type(e).__name__}: {e}", batch_folder) from e
+
+
+class Orchestrator:
+    """
+    Run collection jobs on several carla servers in parallel
+    Each server (host, port) runs its jobs one after another,
+    each job in a new process, failed jobs are retried on the same server:
+    a batch with a checkpoint is continued, other batches of failed attempts are removed
+    orchestrator = Orchestrator(jobs, config_dir)
+    results = orchestrator.run()
+    """
+
+    def __init__(
+            self,
+            jobs: List[Dict],
+            config_dir: str,
+            max_retries: int = 2,
+            overrides: List[str] = None,
+            stand_in: bool = False
+    ):
+        """
+        Args:
+            jobs (list(dict)): jobs to run, see get_overrides()
+            config_dir (str): path to conf folder
+            max_retries (int): number of retries of a failed job
+            overrides (list(str)): hydra overrides applied to all jobs
+            stand_in (bool): run jobs on carla stand-in, for offline testing
+        """
+        self._jobs = list(jobs)
+        self._config_dir = os.path.abspath(config_dir)
+        self._max_retries = max_retries
+        self._overrides = list(overrides) if overrides is not None else list()
+        self._stand_in = stand_in
+
+        # index of job -> result
+        self.results = dict()
+        self._lock = threading.Lock()
+
+    def _group_by_server(self) -> Dict:
+        servers = dict()
+        for i, job in enumerate(self._jobs):
+            server = (job.get("host"), job["port"])
+            servers.setdefault(server, []).append(i)
+        return servers
+
+    @staticmethod
+    def _clean_failed(batch_folder: str) -> str:
+        """
+        Keep batch of a failed attempt only if it can be continued,
+        so that no empty or partial batch is left next to the others
+        Returns:
+            (str): batch folder to resume, None if there is none
+        """
+        if batch_folder is None or not os.path.exists(batch_folder):
+            return None
+        if os.path.exists(f"{batch_folder}/checkpoint.json"):
+            return batch_folder
+        shutil.rmtree(batch_folder, ignore_errors=True)
+        return None
+
+    def _run_on_server(
+            self,
+            job_indices: List[int]
+    ):
+        for i in job_indices:
+            job = self._jobs[i]
+            overrides = self._overrides + get_overrides(job)
+            result = {
+                "job": job,
+                "batch_folder": None,
+                "attempts": 0,
+                "error": None
+            }
+            resume = None
+            for _ in range(self._max_retries + 1):
+                result["attempts"] += 1
+                try:
+                    # new process for each attempt
+                    # crashed server/client does not leak to next job
+                    # spawned, not forked: other dispatching threads may hold locks at fork time
+                    mp_context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+                        future = executor.submit(run_job, self._config_dir, overrides, self._stand_in, resume)
+                        result["batch_folder"] = future.result()
+                    result["error"] = None
+                    break
+                except Exception as e:
+                    result["error"] = traceback.format_exc()
+                    print(f"job {i} failed (attempt {result['attempts']}):\n{result['error']}")
+                    resume = self._clean_failed(getattr(e, "batch_folder", None))
+                    result["batch_folder"] = resume
+
+            with self._lock:
+                self.results[i] = result
+
+    def run(self) -> List[Dict]:
+        """
+        Run all jobs, one thread per server to dispatch its jobs
+        Returns:
+            (list(dict)): result of each job, in order of jobs
+                + job (dict)
+                + batch_folder (str): partial batch with a checkpoint if job failed, else None
+                + attempts (int)
+                + error (str): traceback of last failure, None if succeeded
+        """
+        threads = [
+            threading.Thread(target=self._run_on_server, args=(job_indices,))
+            for job_indices in self._group_by_server().values()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return [self.results[i] for i in range(len(self._jobs))]
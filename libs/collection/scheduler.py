@@ -0,0 +1,124 @@
+import time
+import heapq
+from typing import Callable
+
+from common.timing import TIMINGS, TimingRegistry
+
+
+class _Task:
+    def __init__(self, name: str, func: Callable, period: float, priority: int):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.priority = priority
+        self.num_runs = 0
+        # number of deadlines skipped because task was late by more than a period
+        self.num_missed = 0
+        self.max_lateness = 0.
+
+
+class Scheduler:
+    """
+    Deadline-driven loop running periodic tasks on one thread
+    Deadlines are fixed on a timeline: k-th run of a task is due at start + k * period,
+    so lateness of one run does not shift next runs.
+    The loop sleeps until the earliest deadline, nothing is polled while idle.
+    When several tasks are due, lower priority value runs first.
+    Tasks are not preempted, so lateness is bounded by the longest task.
+    Lateness (actual start - deadline) of each run is recorded into timing registry
+    as "schedule.<name>"
+    scheduler = Scheduler()
+    scheduler.add_task("sample", sample, period=0.1, priority=0)
+    scheduler.add_task("step", step, period=0.01, priority=1)
+    scheduler.run(duration=60.)
+    """
+
+    def __init__(self, registry: TimingRegistry = None):
+        """
+        Args:
+            registry (TimingRegistry): where lateness is recorded, TIMINGS by default
+        """
+        self._registry = registry if registry is not None else TIMINGS
+        self._tasks = []
+        self._stopped = False
+
+    def add_task(
+            self,
+            name: str,
+            func: Callable,
+            period: float,
+            priority: int = 0
+    ):
+        """
+        Args:
+            name (str): name of task
+            func (callable): called without argument at each deadline
+            period (float): seconds between 2 consecutive deadlines
+            priority (int): lower runs first when deadlines are equal
+        """
+        if period <= 0:
+            raise ValueError(f"period of task {name} should be positive, got {period}")
+        self._tasks.append(_Task(name, func, period, priority))
+
+    def stop(self):
+        """
+        Stop loop after the running task, can be called from a task
+        """
+        self._stopped = True
+
+    def run(self, duration: float = None):
+        """
+        Run tasks until duration is over or stop() is called
+        Args:
+            duration (float): in seconds, run forever if None
+        """
+        self._stopped = False
+        start = time.perf_counter()
+        end = None if duration is None else start + duration
+        # (deadline, priority, order, task)
+        queue = [
+            (start, task.priority, i, task)
+            for i, task in enumerate(self._tasks)
+        ]
+        heapq.heapify(queue)
+
+        while queue and not self._stopped:
+            deadline, priority, i, task = queue[0]
+            if end is not None and deadline >= end:
+                break
+            now = time.perf_counter()
+            if deadline > now:
+                time.sleep(deadline - now)
+                # a task of higher priority can not appear while sleeping,
+                # all deadlines are known in advance
+                now = time.perf_counter()
+
+            lateness = now - deadline
+            task.max_lateness = max(task.max_lateness, lateness)
+            self._registry.record(f"schedule.{task.name}", lateness)
+            task.func()
+            task.num_runs += 1
+
+            # next deadline on the timeline,
+            # deadlines already passed are skipped instead of run in a burst
+            next_deadline = deadline + task.period
+            now = time.perf_counter()
+            if next_deadline < now:
+                missed = int((now - next_deadline) // task.period) + 1
+                task.num_missed += missed
+                next_deadline += missed * task.period
+            heapq.heapreplace(queue, (next_deadline, priority, i, task))
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            (dict): name of task -> runs, missed deadlines, max lateness in ms
+        """
+        return {
+            task.name: {
+                "runs": task.num_runs,
+                "missed": task.num_missed,
+                "max_lateness_ms": task.max_lateness * 1000
+            }
+            for task in self._tasks
+        }
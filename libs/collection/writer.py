@@ -0,0 +1,184 @@
+import os
+import glob
+import queue
+import threading
+
+import pandas as pd
+
+from common.table_io import write_table
+
+
+class StreamWriter:
+    """
+    Background writer to append chunks of rows to a table
+    csv: chunks are appended to one file
+    binary formats: each chunk is a part file in a folder, see table_io.read_table()
+    Chunks are passed through a bounded queue,
+    producer never blocks on disk: if queue is full, write() returns False
+    and producer should keep its rows and retry later (backpressure)
+    A chunk can carry a callback, called by the writer thread once it is on disk
+    writer = StreamWriter(file_path)
+    writer.write(df)
+    writer.close()
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            queue_size: int = 8,
+            file_format: str = "csv"
+    ):
+        """
+        Args:
+            file_path (str): path to table without extension, rows will be appended
+            queue_size (int): max number of chunks waiting to be written
+            file_format (str): csv, npz, parquet or feather
+        """
+        self._file_format = file_format
+        if file_format == "csv":
+            self._file_path = f"{file_path}.csv"
+            self._has_header = os.path.exists(self._file_path) and os.path.getsize(self._file_path) > 0
+        else:
+            self._file_path = file_path
+            if not os.path.exists(file_path):
+                os.makedirs(file_path)
+            self._num_parts = len(glob.glob(f"{file_path}/part-*.{file_format}"))
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.num_rows = 0
+        self.error = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def write(self, data: pd.DataFrame, on_written=None) -> bool:
+        """
+        Queue a chunk to be written
+        Args:
+            data (pd.DataFrame): chunk of rows, can be empty if on_written is given
+            on_written (callable): called by writer thread with (num_rows, position)
+                once this chunk and all chunks before it are on disk
+
+        Returns:
+            (bool): False if queue is full, chunk is not taken
+        """
+        if self.error is not None:
+            raise self.error
+        try:
+            self._queue.put_nowait((data, on_written))
+        except queue.Full:
+            return False
+        return True
+
+    def write_blocking(self, data: pd.DataFrame, on_written=None):
+        """
+        Queue a chunk, wait for free slot if queue is full
+        Only used when producer is done, e.g. final flush
+        Args:
+            data (pd.DataFrame): chunk of rows
+            on_written (callable): see write()
+
+        Returns:
+            None
+        """
+        if self.error is not None:
+            raise self.error
+        if len(data) > 0 or on_written is not None:
+            self._queue.put((data, on_written))
+
+    def _write_chunk(self, data: pd.DataFrame):
+        if self._file_format != "csv":
+            self._write_part(data)
+            return
+        # serialize whole chunk before touching the file
+        # so an abort leaves only complete chunks on disk
+        text = data.to_csv(index=False, header=not self._has_header)
+        with open(self._file_path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self._has_header = True
+        self.num_rows += len(data)
+
+    def _write_part(self, data: pd.DataFrame):
+        # written under a temporary name, then renamed,
+        # so an abort leaves only complete parts
+        name = f"{self._num_parts:06d}.{self._file_format}"
+        tmp_path = write_table(data, f"{self._file_path}/tmp-{self._num_parts:06d}", self._file_format)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, f"{self._file_path}/part-{name}")
+        self._num_parts += 1
+        self.num_rows += len(data)
+
+    @property
+    def position(self) -> int:
+        """
+        Size of written table, see truncate()
+        Returns:
+            (int): bytes of csv file, or number of part files
+        """
+        if self._file_format != "csv":
+            return self._num_parts
+        return os.path.getsize(self._file_path) if os.path.exists(self._file_path) else 0
+
+    @staticmethod
+    def truncate(file_path: str, position: int, file_format: str = "csv"):
+        """
+        Drop rows written after position, e.g. to continue from a checkpoint
+        Args:
+            file_path (str): path to table without extension
+            position (int): see StreamWriter.position
+            file_format (str): csv, npz, parquet or feather
+        """
+        if file_format == "csv":
+            if os.path.exists(f"{file_path}.csv"):
+                with open(f"{file_path}.csv", "r+b") as f:
+                    f.truncate(position)
+            return
+        # unfinished parts
+        for tmp_path in glob.glob(f"{file_path}/tmp-*"):
+            os.remove(tmp_path)
+        for part_path in glob.glob(f"{file_path}/part-*"):
+            if int(os.path.basename(part_path)[5:11]) >= position:
+                os.remove(part_path)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                # None is sentinel to stop
+                if item is None:
+                    break
+                # after an error, chunks are dropped, error is raised to producer
+                if self.error is None:
+                    data, on_written = item
+                    if len(data) > 0:
+                        self._write_chunk(data)
+                    if on_written is not None:
+                        on_written(self.num_rows, self.position)
+            except Exception as e:
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Wait until all queued chunks are on disk, writer keeps running
+        """
+        if self._thread.is_alive():
+            self._queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """
+        Wait for all queued chunks to be written and stop writer
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
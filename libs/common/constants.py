@@ -0,0 +1,17 @@
+LIGHT_STATES = [
+    "RED",
+    "YELLOW",
+    "GREEN",
+    "OFF",
+    "UNKNOWN"
+]  # light_state column stores index in this list
+NO_LIGHT_STATE = -1  # light_state of non traffic-light objects
+
+# typed columns can replace json "status" column of dynamic state
+STATUS_COLUMNS = [
+    "status",  # json, kept for backward compatibility
+    "velocity",  # m/s, nan for traffic light
+    "light_state"  # index in LIGHT_STATES, NO_LIGHT_STATE for moving object
+]
+
+NO_INTERSECTION = -1  # intersection of static points without this information (crosswalk, traffic sign)
@@ -5,3 +5,56 @@ def vector3d_to_numpy(v):
     if v is None:
         return np.array([None, None, None])
     return np.array([v.x, v.y, v.z])
+
+
+def transforms_to_numpy(transforms: list) -> tuple:
+    """
+    Args:
+        transforms (list(carla.Transform)):
+
+    Returns:
+        (tuple):
+        (
+            np.ndarray: shape (N, 3), x, y, z of locations
+            np.ndarray: shape (N, 3), pitch, yaw, roll of rotations in degrees
+        )
+    """
+    locations = np.array([
+        (t.location.x, t.location.y, t.location.z)
+        for t in transforms
+    ], dtype=np.float64).reshape((-1, 3))
+    rotations = np.array([
+        (t.rotation.pitch, t.rotation.yaw, t.rotation.roll)
+        for t in transforms
+    ], dtype=np.float64).reshape((-1, 3))
+    return locations, rotations
+
+
+def lateral_points(
+        locations: np.ndarray,
+        rotations: np.ndarray,
+        offsets: np.ndarray
+) -> np.ndarray:
+    """
+    Global points at lateral offsets of transforms, same as
+    transform.transform(carla.Vector3D(0, offset, 0)) for each transform, in one rotation
+    e.g. offsets = -lane_width / 2 for left boundary of lanes, +lane_width / 2 for right one
+    Args:
+        locations (np.ndarray): shape (N, 3), see transforms_to_numpy()
+        rotations (np.ndarray): shape (N, 3), pitch, yaw, roll in degrees
+        offsets (np.ndarray | float): shape (N,), to the right in meters
+
+    Returns:
+        (np.ndarray): shape (N, 3)
+    """
+    pitch, yaw, roll = np.radians(rotations).T
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+    # second column of rotation matrix of carla (unreal), applied to local y axis
+    right = np.stack([
+        cy * sp * sr - sy * cr,
+        sy * sp * sr + cy * cr,
+        -cp * sr
+    ], axis=1)
+    return locations + right * np.reshape(offsets, (-1, 1))
@@ -4,7 +4,9 @@ import carla
 class Environment:
     def __init__(self, config):
         self._config = config
-        self.world, self.map = self.init_carla()
+        self.client, self.world, self.map = self.init_carla()
+        # settings before changing to synchronous mode
+        self._original_settings = None
 
     def init_carla(self):
         # init client, world and map
@@ -15,4 +17,29 @@ class Environment:
         _world = _client.load_world(self._config.map.town)
         _map = _world.get_map()
 
-        return _world, _map
+        return _client, _world, _map
+
+    def set_synchronous_mode(self):
+        """
+        Put world in synchronous mode with fixed time-step,
+        server only moves forward on world.tick()
+        Settings are taken from config.simulation
+        """
+        sim_config = self._config.simulation
+        self._original_settings = self.world.get_settings()
+
+        settings = self.world.get_settings()
+        settings.synchronous_mode = True
+        settings.fixed_delta_seconds = sim_config.fixed_delta_seconds
+        settings.no_rendering_mode = sim_config.no_rendering_mode
+        self.world.apply_settings(settings)
+
+    def restore_settings(self):
+        """
+        Give back world settings before set_synchronous_mode(),
+        otherwise server keeps waiting for ticks
+        """
+        if self._original_settings is None:
+            return
+        self.world.apply_settings(self._original_settings)
+        self._original_settings = None
@@ -1,14 +1,22 @@
-import carla
 import numpy as np
 import matplotlib.pyplot as plt
 from abc import abstractmethod, ABC
-from common.convert import vector3d_to_numpy
+from common.convert import vector3d_to_numpy, transforms_to_numpy, lateral_points
 
 
 class Shape:
-    def __init__(self, data):
+    def __init__(self, data, points: np.ndarray = None):
+        """
+        Args:
+            data: carla objects of shape,
+                or np.ndarray of its points, e.g. restored from map cache
+            points (np.ndarray): points of shape if already computed, e.g. for the whole map at once
+        """
         self._data = data
-        self.points = self._get_points()
+        if points is not None:
+            self.points = points
+        else:
+            self.points = data if isinstance(data, np.ndarray) else self._get_points()
 
     def get_data(self):
         return self._data
@@ -71,8 +79,15 @@ class Circle(Shape, ABC):
     Each Circle._data contains 1 Actor Traffic sign
     """
 
-    def __init__(self, data):
+    def __init__(self, data, text: str = None):
+        """
+        Args:
+            data (carla.Actor | np.ndarray): traffic sign, or its location
+            text (str): text next to circle, taken from type_id of traffic sign if None
+        """
         super().__init__(data)
+        # skip "traffic" in text
+        self.text = text if text is not None else ".".join(data.type_id.split(".")[1:])
         self._radius = 2.
         self._color = 'r'
         self._font_size = 5.
@@ -93,11 +108,9 @@ class Circle(Shape, ABC):
 
         # draw text
         x, y, _ = self.points
-        # skip "traffic" in text
-        txt = ".".join(self._data.type_id.split(".")[1:])
         ax.text(
             x=x + self._offset[0], y=y + self._offset[1],
-            s=txt, fontsize=self._font_size
+            s=self.text, fontsize=self._font_size
         )
 
 
@@ -109,13 +122,15 @@ class ListWaypoint(Shape, ABC):
 
     def __init__(
             self,
-            data: list
+            data: list,
+            points: np.ndarray = None
     ):
         """
         Args:
             data (list(carla.Waypoint)):
+            points (np.ndarray): shape (N, 3), locations of waypoints if already computed
         """
-        super().__init__(data)
+        super().__init__(data, points)
         self._line_style = 'o'
         self._color = (0, 1, 0)
         self._marker_size = 1.
@@ -158,31 +173,13 @@ class ListLanePoint(Shape, ABC):
         self._marker_size = 1.
 
     def _get_points(self):
-        lane_points = np.empty((0, 6))
-        for wp in self._data:
-            # # skip if its junction
-            # if wp.is_junction:
-            #     continue
-
-            # get waypoint's transform
-            transform = wp.transform
-            # transform left/right point
-            # to get lane point at current waypoint
-            lane_width = wp.lane_width
-            l_point = carla.Vector3D(0, -lane_width / 2, 0)
-            r_point = carla.Vector3D(0, lane_width / 2, 0)
-
-            global_l_point = transform.transform(l_point)
-            global_r_point = transform.transform(r_point)
-
-            # stack to container
-            numpy_l_r = np.concatenate([
-                vector3d_to_numpy(global_l_point),
-                vector3d_to_numpy(global_r_point)
-            ])
-            lane_points = np.vstack([lane_points, numpy_l_r])
-
-        return lane_points
+        # left/right lane points at each waypoint, in one rotation
+        locations, rotations = transforms_to_numpy([wp.transform for wp in self._data])
+        half_widths = np.array([wp.lane_width for wp in self._data], dtype=np.float64) / 2
+        return np.hstack([
+            lateral_points(locations, rotations, -half_widths),
+            lateral_points(locations, rotations, half_widths)
+        ])
 
     def draw(self, ax):
         # plot left lane
@@ -216,8 +213,8 @@ class Polyline(Shape, ABC):
     ):
         """
         Args:
-            data: (list(carla.Location))
-                List location to create Lane polyline
+            data: (list(carla.Location) | np.ndarray)
+                List location (or points) to create Lane polyline
                 For default, each polyline has 10 points
             waypoints: (list(carla.Waypoint))
                 List of waypoints used to generate lanes
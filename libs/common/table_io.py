@@ -0,0 +1,142 @@
+import os
+import glob
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# supported formats, in order of preference when several files of a table exist
+# parquet and feather need pyarrow
+FORMATS = ["parquet", "feather", "npz", "csv"]
+
+
+def _check_format(file_format: str):
+    if file_format not in FORMATS:
+        raise ValueError(f"unknown storage format {file_format}, should be one of {FORMATS}")
+
+
+def _write_npz(data: pd.DataFrame, file_path: str):
+    # one compressed array per column, keyed by position so any column name works
+    arrays = {"__columns__": np.array([str(col) for col in data.columns], dtype=str)}
+    for i, col in enumerate(data.columns):
+        values = data[col].to_numpy()
+        if values.dtype.kind not in "biuf":
+            # text is stored as fixed-width unicode, missing values in a mask
+            is_null = pd.isna(values)
+            values = np.where(is_null, "", values).astype(str)
+            if is_null.any():
+                arrays[f"__null__{i}"] = is_null
+        arrays[str(i)] = values
+    np.savez_compressed(file_path, **arrays)
+
+
+def _read_npz(file_path: str, columns: List[str] = None) -> pd.DataFrame:
+    with np.load(file_path, allow_pickle=False) as f:
+        all_columns = f["__columns__"].tolist()
+        data = dict()
+        for i, col in enumerate(all_columns):
+            # arrays are loaded lazily, only requested columns are decompressed
+            if columns is not None and col not in columns:
+                continue
+            values = f[str(i)]
+            if values.dtype.kind == "U":
+                values = values.astype(object)
+                if f"__null__{i}" in f.files:
+                    values[f[f"__null__{i}"]] = np.nan
+            data[col] = values
+    data = pd.DataFrame(data)
+    return data if columns is None else data[list(columns)]
+
+
+def write_table(
+        data: pd.DataFrame,
+        file_path: str,
+        file_format: str = "csv"
+) -> str:
+    """
+    Write a table with typed columns
+    Args:
+        data (pd.DataFrame): table
+        file_path (str): path without extension, e.g. batch00/dynamic_state
+        file_format (str): csv, npz (compressed numpy), parquet or feather
+
+    Returns:
+        (str): path of written file
+    """
+    _check_format(file_format)
+    file_path = f"{file_path}.{file_format}"
+    if file_format == "csv":
+        data.to_csv(file_path, index=False)
+    elif file_format == "npz":
+        _write_npz(data, file_path)
+    elif file_format == "parquet":
+        data.to_parquet(file_path, index=False)
+    else:
+        data.reset_index(drop=True).to_feather(file_path)
+    return file_path
+
+
+def read_table(
+        file_path: str,
+        columns: List[str] = None
+) -> pd.DataFrame:
+    """
+    Read a table written by write_table(), format is taken from extension
+    A folder is read as a table split in parts (streamed chunks)
+    Args:
+        file_path (str): path to file or folder of parts
+        columns (list(str)): columns to read, all if None
+
+    Returns:
+        (pd.DataFrame)
+    """
+    if os.path.isdir(file_path):
+        parts = sorted(glob.glob(f"{file_path}/part-*"))
+        if len(parts) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat([read_table(path, columns) for path in parts], ignore_index=True)
+
+    file_format = os.path.splitext(file_path)[1][1:]
+    _check_format(file_format)
+    if file_format == "csv":
+        return pd.read_csv(file_path, usecols=columns)
+    if file_format == "npz":
+        return _read_npz(file_path, columns)
+    if file_format == "parquet":
+        return pd.read_parquet(file_path, columns=columns)
+    return pd.read_feather(file_path, columns=columns)
+
+
+def find_table(
+        folder_path: str,
+        name: str
+) -> str:
+    """
+    Find file of a table in any supported format
+    Args:
+        folder_path (str): e.g. batch folder
+        name (str): name of table, e.g. dynamic_state
+
+    Returns:
+        (str): path to file or folder of parts
+    """
+    candidates = [f"{folder_path}/{name}"] + [
+        f"{folder_path}/{name}.{file_format}"
+        for file_format in FORMATS
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"table {name} is not found in {folder_path}")
+
+
+def list_tables(folder_path: str) -> List[str]:
+    """
+    Returns:
+        (list(str)): all table files in folder, in any supported format
+    """
+    return sorted(
+        path
+        for file_format in FORMATS
+        for path in glob.glob(f"{folder_path}/*.{file_format}")
+    )
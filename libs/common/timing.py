@@ -0,0 +1,166 @@
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Dict
+
+# upper edges of histogram bins, in seconds
+# from 1us to ~134s, 4 bins per octave
+_BIN_EDGES = [1e-6 * 2 ** (k / 4) for k in range(109)]
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = float("inf")
+        self.max = 0.
+        # last bin is for durations > _BIN_EDGES[-1]
+        self.bins = [0] * (len(_BIN_EDGES) + 1)
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        self.bins[bisect.bisect_left(_BIN_EDGES, duration)] += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Approximate percentile, upper edge of bin containing q-th percentile
+        """
+        target = q / 100. * self.count
+        cumulative = 0
+        for i, num in enumerate(self.bins):
+            cumulative += num
+            if cumulative >= target and num > 0:
+                edge = _BIN_EDGES[i] if i < len(_BIN_EDGES) else self.max
+                return min(edge, self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1000,
+            "min_ms": self.min * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000
+        }
+
+
+class TimingRegistry:
+    """
+    Named timings, each name keeps a histogram of durations
+    Cheap enough to stay enabled while collecting
+    registry = TimingRegistry()
+
+    @registry.timeit("agent.run_step")
+    def run_step():
+        ...
+
+    with registry.measure("map.extract"):
+        ...
+
+    registry.save(batch_folder)
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._histograms = dict()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float):
+        """
+        Args:
+            name (str): name of timing
+            duration (float): in seconds
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram()
+            histogram.add(duration)
+
+    def measure(self, name: str, verbose: bool = False):
+        """
+        Context manager to record duration of a block
+        """
+        return TimeIt(name, registry=self, verbose=verbose)
+
+    def timeit(self, name: str):
+        """
+        Decorator to record duration of each call of a function
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict:
+        """
+        Returns:
+            (dict): name -> count, total_s, mean/min/p50/p99/max in ms
+        """
+        with self._lock:
+            return {
+                name: histogram.summary()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def save(self, folder_path: str, file_name: str = "timing.json"):
+        with open(f"{folder_path}/{file_name}", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def print_summary(self):
+        for name, stats in self.summary().items():
+            print(f"{name}: {stats['count']} calls, total {stats['total_s']:.02f}s, "
+                  f"p50 {stats['p50_ms']:.02f}ms, p99 {stats['p99_ms']:.02f}ms")
+
+    def reset(self):
+        with self._lock:
+            self._histograms = dict()
+
+
+# registry shared by the whole process
+TIMINGS = TimingRegistry()
+
+
+def timeit(name: str):
+    """
+    Decorator to record duration into TIMINGS
+    """
+    return TIMINGS.timeit(name)
+
+
+class TimeIt:
+    """
+    Class to measure run-time of a function or computation...
+    Duration is recorded into registry (TIMINGS by default),
+    and printed if verbose
+    """
+    def __init__(self, name: str = None, registry: TimingRegistry = None, verbose: bool = True):
+        self._name = name if name is not None else "Func"
+        self._registry = registry if registry is not None else TIMINGS
+        self._verbose = verbose
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        dur = time.perf_counter() - self._start
+        self._registry.record(self._name, dur)
+        if self._verbose:
+            print(f"{self._name}: {dur * 1000:.02f}ms")
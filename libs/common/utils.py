@@ -1,17 +1,47 @@
-import time
+import os
 
+# kept here for backward compatibility
+from common.timing import TimeIt, TIMINGS, timeit
 
-class TimeIt:
+
+def allocate_batch_folder(folder_path: str) -> str:
     """
-    Class to measure run-time of a function or computation...
+    Create a new "batch{N}" folder in folder_path
+    Folder is created atomically, so runs in parallel never get the same batch
+    Args:
+        folder_path (str): data folder
+
+    Returns:
+        (str): path to created batch folder
     """
-    def __init__(self, name: str = None):
-        self._name = name if name is not None else "Func"
+    if not os.path.exists(folder_path):
+        os.makedirs(folder_path, exist_ok=True)
+
+    batch_num = len(os.listdir(folder_path))
+    while True:
+        batch_folder = f"{folder_path}/batch{batch_num:02d}"
+        try:
+            os.makedirs(batch_folder)
+            return batch_folder
+        except FileExistsError:
+            batch_num += 1
 
-    def __enter__(self):
-        self._start = time.time()
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._end = time.time()
-        dur = (self._end - self._start) * 1000
-        print(f"{self._name}: {dur:.02f}ms")
+def get_ticks_per_sample(delta_time: float, fixed_delta: float) -> int:
+    """
+    Number of world ticks between 2 consecutive samples in synchronous mode
+    Args:
+        delta_time (float): time between 2 samples, storage.delta_time
+        fixed_delta (float): simulation time of one tick, simulation.fixed_delta_seconds
+
+    Returns:
+        (int)
+    """
+    ticks = int(round(delta_time / fixed_delta))
+    # otherwise samples would be taken every ticks * fixed_delta, not every delta_time
+    if ticks < 1 or abs(ticks * fixed_delta - delta_time) > 1e-6:
+        raise ValueError(
+            f"storage.delta_time ({delta_time}) should be a multiple of "
+            f"simulation.fixed_delta_seconds ({fixed_delta}) in synchronous mode"
+        )
+    return ticks
@@ -9,8 +9,8 @@ ORDERED_COLUMNS = [
     "object_type",
     "center_x",
     "center_y",
-    "heading",
-    "status"
+    "heading"
 ]  # a little fixed code here but, based on recorded data, too...
+# status columns in recorded data are appended after ORDERED_COLUMNS
 
-MAX_WORKERS = 5
+MAX_WORKERS = 5  # default number of worker processes of convertor, see do_convert.py --workers
@@ -2,11 +2,14 @@ import os
 import glob
 import shutil
 
-import pandas as pd
-
+from collections import deque
 from concurrent.futures import ProcessPoolExecutor
-from convertor.process import set_roles_process
-from convertor.constants import NUM_TS_PER_SCENE, MAX_WORKERS
+from convertor.process import convert_batch_process, convert_scenes_process, read_scenes
+from convertor.constants import MAX_WORKERS
+from common.timing import TIMINGS
+from common.table_io import find_table
+from visual.raster.scene import rasterize_scenes
+from maps.lane_graph import LANE_GRAPH_FILE_NAME
 
 
 class ConvertToArgoverse:
@@ -20,95 +23,124 @@ class ConvertToArgoverse:
     def __init__(
             self,
             data_folder: str,
-    ):
-        self._data_folder = data_folder
-
-    @staticmethod
-    def _set_roles(
-            data_scene: pd.DataFrame,
-            counter: int,
-            save_folder: str,
-            batch_name: str
+            file_format: str = "csv",
+            image_format: str = None,
+            max_workers: int = MAX_WORKERS
     ):
         """
-        Set AGENT role for objects, one by one
-        AV will be randomly set for the others
-        Dataframe after setting role will be save into "save_folder"
         Args:
-            data_scene: (pd.DataFrame)
-            counter: (int)
-            save_folder: (str)
-            batch_name: (str)
-
+            data_folder (str): folder of collected batches
+            file_format (str): format of converted scenes, csv, npz, parquet or feather
+            image_format (str): jpeg, png or npz to also rasterize converted scenes, None to skip
+            max_workers (int): number of worker processes, each converts one batch, or a range of its scenes, at a time
         """
-        # get list of ids
-        ids = data_scene["id"].unique().tolist()
-        # multi-process
-        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            for agent_id in ids:
-                executor.submit(
-                    set_roles_process,
-                    data_scene=data_scene,
-                    agent_id=agent_id,
-                    counter=counter,
-                    save_folder=save_folder,
-                    batch_name=batch_name
-                )
+        self._data_folder = data_folder
+        self._file_format = file_format
+        self._image_format = image_format
+        self._max_workers = max_workers
+
+        # batches being converted, each read, windowed and converted by one worker,
+        # or split into ranges of scenes if there are less batches than workers
+        # at most 2 tasks per worker are submitted
+        self._max_pending = 2 * max_workers
+        self._pending = deque()
+        self.num_scenes = 0
+        self.num_errors = 0
+
+    def _copy_static(self, batch: str, all_batches_folder: str):
+        # copy dynamic properties and static map, in their format
+        for name in ["dynamic_property", "static"]:
+            file_path = find_table(batch, name)
+            shutil.copyfile(
+                file_path,
+                f"{all_batches_folder}/{os.path.basename(file_path)}"
+            )
+        # copy lane graph, batches collected before it was exported have none
+        if os.path.exists(f"{batch}/{LANE_GRAPH_FILE_NAME}"):
+            shutil.copyfile(
+                f"{batch}/{LANE_GRAPH_FILE_NAME}",
+                f"{all_batches_folder}/{LANE_GRAPH_FILE_NAME}"
+            )
+        # copy meta dataset
+        shutil.copyfile(
+            f"{batch}/data_config.txt",
+            f"{all_batches_folder}/data_config.txt"
+        )
+
+    def _wait(self, pending: tuple):
+        # result of a part of batch, timings of its worker are recorded here
+        batch, part, num_parts, future = pending
+        name = batch if num_parts == 1 else f"{batch} (part {part + 1}/{num_parts})"
+        try:
+            result = future.result()
+        except Exception as e:
+            self.num_errors += 1
+            print(f"conversion of batch {name} failed: {e}")
+            return
+        self.num_scenes += result["num_scenes"]
+        self.num_errors += result["num_errors"]
+        for timing, duration in result["durations"].items():
+            TIMINGS.record(timing, duration)
+        print(f"converted {name}: {result['num_scenes']} scenes")
+
+    def _submit(self, executor, task: tuple, func, **kwargs):
+        # bounded: wait for the oldest task if workers are behind
+        while len(self._pending) >= self._max_pending:
+            self._wait(self._pending.popleft())
+        self._pending.append(task + (executor.submit(func, **kwargs),))
 
     def convert(self):
         """
         Main function to convert data
         """
-        batches = glob.glob(f"{self._data_folder}/*")
-
+        # convert_timing.json is of this conversion only
+        TIMINGS.reset()
         # folder to reserve separated data by timestamp
         all_batches_folder = f"{self._data_folder}/all_batches"
         dynamic_by_ts_folder = f"{all_batches_folder}/dynamic_by_ts"
         if not os.path.exists(dynamic_by_ts_folder):
             os.makedirs(dynamic_by_ts_folder)
 
-        for i, batch in enumerate(batches):
-            if "all" in batch:
-                continue
+        # collected batches only, not all_batches
+        batches = sorted(
+            batch
+            for batch in glob.glob(f"{self._data_folder}/*")
+            if batch != all_batches_folder and os.path.exists(f"{batch}/data_config.txt")
+        )
 
-            if i == 0:
-                # copy dynamic properties
-                shutil.copyfile(
-                    f"{batch}/dynamic_property.csv",
-                    f"{all_batches_folder}/dynamic_property.csv"
-                )
-                # copy static map
-                shutil.copyfile(
-                    f"{batch}/static.csv",
-                    f"{all_batches_folder}/static.csv"
-                )
-                # copy meta dataset
-                shutil.copyfile(
-                    f"{batch}/data_config.txt",
-                    f"{all_batches_folder}/data_config.txt"
-                )
+        if len(batches) > 0:
+            self._copy_static(batches[0], all_batches_folder)
 
-            # read dynamic object data and its property
-            dynamic_prop = pd.read_csv(f"{batch}/dynamic_property.csv")
-            dynamic_state = pd.read_csv(f"{batch}/dynamic_state.csv")
-            data = pd.merge(dynamic_prop, dynamic_state)
+        # one worker per batch: read, window and convert
+        # a few long batches are read and windowed once here, then split into ranges of scenes,
+        # so that all workers are used
+        num_parts = -(-self._max_workers // len(batches)) if 0 < len(batches) < self._max_workers else 1
+        with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+            try:
+                for batch in batches:
+                    if num_parts == 1:
+                        self._submit(executor, (batch, 0, 1), convert_batch_process, batch=batch,
+                                     save_folder=dynamic_by_ts_folder, file_format=self._file_format)
+                        continue
+                    scenes, durations = read_scenes(batch)
+                    for timing, duration in durations.items():
+                        TIMINGS.record(timing, duration)
+                    for part in range(num_parts):
+                        self._submit(
+                            executor, (batch, part, num_parts), convert_scenes_process,
+                            scenes=scenes[part * len(scenes) // num_parts: (part + 1) * len(scenes) // num_parts],
+                            save_folder=dynamic_by_ts_folder,
+                            batch_name=os.path.basename(batch),
+                            file_format=self._file_format
+                        )
+            finally:
+                while self._pending:
+                    self._wait(self._pending.popleft())
+        print(f"{self.num_scenes} scenes converted from {len(batches)} batches, {self.num_errors} failed")
 
-            # columns for final result
-            columns = dynamic_state.columns
-            # group data by timestamp
-            group_by_ts = data.groupby(by=["timestamp"])
+        # bird's-eye-view images of converted scenes
+        if self._image_format is not None:
+            rasterize_scenes(all_batches_folder, image_format=self._image_format)
 
-            data_scene = pd.DataFrame(columns=columns)
-            for i, (ts, frame) in enumerate(group_by_ts):
-                counter = i + 1
-                # do not get traffic_light...
-                frame = frame.loc[frame["type"] != "traffic_light", columns]
-                data_scene = pd.concat([data_scene, frame])
-                # save data scene
-                if counter != 1 and counter % NUM_TS_PER_SCENE == 0:
-                    batch_name = os.path.basename(batch)
-                    # done a scene data
-                    # ready to set AV, AGENT
-                    self._set_roles(data_scene, counter, dynamic_by_ts_folder, batch_name)
-                    # reset data_scene
-                    data_scene = pd.DataFrame(columns=columns)
+        # where conversion time went
+        TIMINGS.save(all_batches_folder, "convert_timing.json")
@@ -0,0 +1,150 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from convertor.process import set_roles_process
+from convertor.constants import NUM_TS_PER_SCENE
+from common.table_io import write_table
+from common.save_configs import save_config
+
+
+def emit_scene(
+        data_scene: pd.DataFrame,
+        counter: int,
+        save_folder: str,
+        batch_name: str,
+        file_format: str = "csv"
+):
+    """
+    Save one Argoverse scene per object of data_scene, object is AGENT in its scene
+    Same output as ConvertToArgoverse._set_roles(), executed in a worker process
+    """
+    set_roles_process(
+        data_scene=data_scene,
+        counter=counter,
+        save_folder=save_folder,
+        batch_name=batch_name,
+        file_format=file_format
+    )
+
+
+class OnlineConvertor:
+    """
+    Convert to Argoverse format while collecting, instead of do_convert.py afterwards
+    Frames are kept in a ring buffer of NUM_TS_PER_SCENE frames,
+    when a window is complete, its scenes are emitted by worker processes
+    Output is the same as ConvertToArgoverse: {data_folder}/all_batches/dynamic_by_ts
+    convertor = OnlineConvertor(data_folder, batch_name, static, dynamic_property, config)
+    convertor.append(data)  # each sample
+    convertor.close()
+    """
+
+    def __init__(
+            self,
+            data_folder: str,
+            batch_name: str,
+            static: pd.DataFrame,
+            dynamic_property: pd.DataFrame,
+            config: dict,
+            lane_graph=None,
+            max_workers: int = 2,
+            file_format: str = "csv",
+            start_counter: int = 0
+    ):
+        """
+        Args:
+            data_folder (str): folder of all batches
+            batch_name (str): name of collected batch, prefix of scene files
+            static (pd.DataFrame): static map
+            dynamic_property (pd.DataFrame): property of agents, also to skip traffic lights
+            config (dict): resolved config of collection
+            lane_graph (maps.lane_graph.LaneGraph): saved next to static map, if not None
+            max_workers (int): number of worker processes
+            file_format (str): format of scene files, csv, npz, parquet or feather
+            start_counter (int): number of frames already converted, when resuming a batch
+        """
+        self._all_batches_folder = f"{data_folder}/all_batches"
+        self._save_folder = f"{self._all_batches_folder}/dynamic_by_ts"
+        if not os.path.exists(self._save_folder):
+            os.makedirs(self._save_folder)
+        self._batch_name = batch_name
+        self._file_format = file_format
+
+        self._light_ids = dynamic_property.loc[dynamic_property["type"] == "traffic_light", "id"].to_numpy()
+        self._frames = deque(maxlen=NUM_TS_PER_SCENE)
+        self._counter = start_counter
+
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        # windows being converted, at most 2 per worker are kept in memory
+        self._max_pending = 2 * max_workers
+        self._pending = deque()
+        self.num_windows = 0
+        self.num_errors = 0
+
+        # static map and properties, as offline convertor does for first batch
+        if not os.path.exists(f"{self._all_batches_folder}/data_config.txt"):
+            self._save_static(static, dynamic_property, config, lane_graph)
+
+    def _save_static(self, static: pd.DataFrame, dynamic_property: pd.DataFrame, config: dict, lane_graph):
+        write_table(static, f"{self._all_batches_folder}/static", self._file_format)
+        if lane_graph is not None:
+            lane_graph.save(self._all_batches_folder)
+        write_table(dynamic_property, f"{self._all_batches_folder}/dynamic_property", self._file_format)
+        save_config(self._all_batches_folder, config)
+
+    def append(self, data: dict):
+        """
+        Add one frame, emit scenes if a window is complete
+        Args:
+            data (dict(str, np.ndarray)): rows of one timestamp, see AgentHandler.get_data_dynamic_state()
+                None is ignored (no new frame)
+        """
+        if data is None:
+            return
+        # do not get traffic_light...
+        is_object = ~np.isin(data["id"], self._light_ids)
+        self._frames.append({
+            col: np.asarray(values)[is_object]
+            for col, values in data.items()
+        })
+        self._counter += 1
+        if self._counter % NUM_TS_PER_SCENE == 0 and len(self._frames) == NUM_TS_PER_SCENE:
+            self._emit()
+
+    def _emit(self):
+        data_scene = pd.DataFrame({
+            col: np.concatenate([frame[col] for frame in self._frames])
+            for col in self._frames[0]
+        })
+        self._frames.clear()
+        # bounded memory: wait for the oldest window if workers are behind
+        while len(self._pending) >= self._max_pending or (self._pending and self._pending[0].done()):
+            self._check(self._pending.popleft())
+        self._pending.append(self._executor.submit(
+            emit_scene,
+            data_scene,
+            self._counter,
+            self._save_folder,
+            self._batch_name,
+            self._file_format
+        ))
+        self.num_windows += 1
+
+    def _check(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            self.num_errors += 1
+            print(f"online conversion of a window failed: {e}")
+
+    def close(self):
+        """
+        Wait for all windows to be converted, frames of an incomplete window are dropped
+        """
+        while self._pending:
+            self._check(self._pending.popleft())
+        self._executor.shutdown()
+        print(f"online conversion: {self.num_windows} windows, {self.num_errors} failed")
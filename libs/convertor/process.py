@@ -1,36 +1,113 @@
+import os
+import time
+
 from convertor.utils import (
-    get_object_in_range,
-    assign_av
+    get_scenes,
+    get_objects_in_range,
+    get_roles,
+    ROLES
 )
 from convertor.constants import ORDERED_COLUMNS
+from common.constants import STATUS_COLUMNS
+from common.table_io import write_table, read_table, find_table
 
 
 def set_roles_process(
         data_scene,
-        agent_id,
         counter,
         save_folder,
-        batch_name
+        batch_name,
+        file_format="csv"
 ):
-    data_scene_clone = data_scene.copy(deep=True)
-    # get object surrounding AGENT in range
-    data_scene_clone = get_object_in_range(
-        data_scene=data_scene_clone,
-        agent_id=agent_id
-    )
-    # assign AV
-    data_scene_clone = assign_av(
-        data_scene=data_scene_clone,
-        agent_id=agent_id
-    )
-    # skip if return None
-    # means scene only has < 2 objects
-    if data_scene_clone is None:
-        return
+    """
+    Set AGENT role for every object of a scene, neighbors and roles of all AGENTs are computed at once
+    One scene is saved per AGENT, with objects in its range
+    """
+    neighbors = get_objects_in_range(data_scene)
+    # AGENTs of scenes with < 2 objects are skipped
+    kept, roles = get_roles(neighbors)
+    agent_ids = neighbors["object_ids"][neighbors["agents"][kept]]
+
     # re-order column in dataframe
-    data_scene_clone = data_scene_clone[ORDERED_COLUMNS]
-    # save dataframe
-    data_scene_clone.to_csv(
-        f"{save_folder}/{batch_name}_{counter:012d}_{agent_id:04d}.csv",
-        index=False
-    )
+    status_columns = [col for col in STATUS_COLUMNS if col in data_scene.columns]
+    columns = [col for col in ORDERED_COLUMNS if col != "object_type"] + status_columns
+    values = data_scene[columns]
+    for agent_id, agent_roles in zip(agent_ids, roles):
+        is_in_range = agent_roles >= 0
+        data_agent = values.loc[is_in_range]
+        data_agent.insert(ORDERED_COLUMNS.index("object_type"), "object_type", ROLES[agent_roles[is_in_range]])
+        # save dataframe
+        write_table(
+            data_agent,
+            f"{save_folder}/{batch_name}_{counter:012d}_{agent_id:04d}",
+            file_format
+        )
+
+
+def read_scenes(batch) -> tuple:
+    """
+    Read and window one collected batch
+    Returns:
+        (tuple):
+        (
+            list(tuple(int, pd.DataFrame)): scenes, see get_scenes()
+            dict: durations of reading and windowing (name of step -> seconds)
+        )
+    """
+    durations = dict()
+    start = time.perf_counter()
+    dynamic_prop = read_table(find_table(batch, "dynamic_property"), columns=["id", "type"])
+    dynamic_state = read_table(find_table(batch, "dynamic_state"))
+    durations["convert.read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scenes = get_scenes(dynamic_prop, dynamic_state)
+    durations["convert.window"] = time.perf_counter() - start
+    return scenes, durations
+
+
+def convert_scenes_process(
+        scenes,
+        save_folder,
+        batch_name,
+        file_format="csv"
+) -> dict:
+    """
+    Convert scenes of a batch, in a worker process
+    A failed scene is counted and skipped, the other scenes are still converted
+    Args:
+        scenes (list(tuple(int, pd.DataFrame))): see get_scenes()
+
+    Returns:
+        (dict): num_scenes, num_errors, durations (name of step -> seconds)
+    """
+    start = time.perf_counter()
+    num_errors = 0
+    for counter, data_scene in scenes:
+        try:
+            set_roles_process(data_scene, counter, save_folder, batch_name, file_format)
+        except Exception as e:
+            num_errors += 1
+            print(f"conversion of scene {batch_name} {counter} failed: {e}")
+
+    return {
+        "num_scenes": len(scenes),
+        "num_errors": num_errors,
+        "durations": {"convert.set_roles": time.perf_counter() - start}
+    }
+
+
+def convert_batch_process(
+        batch,
+        save_folder,
+        file_format="csv"
+) -> dict:
+    """
+    Read, window and convert one collected batch, in a worker process
+    Returns:
+        (dict): see convert_scenes_process(), with durations of reading and windowing
+    """
+    scenes, durations = read_scenes(batch)
+    result = convert_scenes_process(scenes, save_folder, os.path.basename(batch), file_format)
+    result["durations"].update(durations)
+    return result
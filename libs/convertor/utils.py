@@ -3,127 +3,131 @@ import pandas as pd
 
 from convertor.constants import (
     FREQ,
-    RADIUS_AROUND_AGENT
+    RADIUS_AROUND_AGENT,
+    NUM_TS_PER_SCENE
 )
 
+# codes of object_type in role matrix, see get_roles()
+ROLES = np.array(["OTHERS", "AGENT", "AV"], dtype=object)
 
-def assign_object_type(
-        row,
-        agent_id,
-        av_id
-) -> pd.Series:
-    """
-    Side function to assign role for object
-    This will be applied for each row in dataframe
-    This function should be applied by row
-    Args:
-        row: (pd.DataFrame)
-        agent_id: (int) AGENT id
-        av_id: (int) AV id
 
-    Returns:
-        (pd.DataFrame)
+def get_scenes(
+        dynamic_property: pd.DataFrame,
+        dynamic_state: pd.DataFrame
+) -> list:
     """
-    if row["id"] == agent_id:
-        row["object_type"] = "AGENT"
-    elif row["id"] == av_id:
-        row["object_type"] = "AV"
-    else:
-        row["object_type"] = "OTHERS"
-    return row
-
-
-def estimate_distance(
-        row: pd.DataFrame,
-        agent_x: float,
-        agent_y: float
-):
-    """
-    Side function to estimate distance
-    from AGENT to the other vehicles
-    This function should be applied by row
+    Split a batch into scenes of NUM_TS_PER_SCENE frames
+    Rows are sorted once by frame index, each scene is a slice of the sorted table,
+    traffic lights and objects without property are dropped once for the whole batch
     Args:
-        row: (pd.DataFrame)
-        agent_x: (float) x coordinate of agent
-        agent_y: (float) y coordinate of agent
+        dynamic_property (pd.DataFrame): id, type of objects
+        dynamic_state (pd.DataFrame): rows of all timestamps
 
     Returns:
-        (pd.DataFrame)
+        (list(tuple(int, pd.DataFrame))): number of frames until end of scene, rows of scene
     """
-    row["distance"] = np.sqrt(
-        (row["center_x"] - agent_x) ** 2 +
-        (row["center_y"] - agent_y) ** 2
-    )
-    return row
-
-
-def get_object_in_range(
-        data_scene: pd.DataFrame,
-        agent_id: int
-) -> pd.DataFrame:
+    # frame index of each row, in order of timestamps
+    timestamps, frames = np.unique(dynamic_state["timestamp"].to_numpy(), return_inverse=True)
+    # position of object in property, rows of a frame keep this order (as merging on property)
+    positions = pd.Index(dynamic_property["id"]).get_indexer(dynamic_state["id"])
+    # do not get traffic_light..., nor objects without property (position -1 picks the last False)
+    is_object = np.append(dynamic_property["type"].to_numpy() != "traffic_light", False)[positions]
+    rows = np.flatnonzero(is_object)
+    rows = rows[np.lexsort((rows, positions[rows], frames[rows]))]
+    frames = frames[rows]
+
+    data = dynamic_state.iloc[rows].reset_index(drop=True)
+    num_scenes = len(timestamps) // NUM_TS_PER_SCENE
+    bounds = np.searchsorted(frames, np.arange(num_scenes + 1) * NUM_TS_PER_SCENE)
+    return [
+        ((k + 1) * NUM_TS_PER_SCENE, data.iloc[bounds[k]: bounds[k + 1]])
+        for k in range(num_scenes)
+    ]
+
+
+def get_objects_in_range(
+        data_scene: pd.DataFrame
+) -> dict:
     """
-    Get object in range
-    with AGENT is origin
+    Get objects in range of every AGENT of a scene at once
+    Position of AGENT is taken at 2s of its track (its row FREQ * 2),
+    objects in range are the ones within RADIUS_AROUND_AGENT at this timestamp
+    Objects with a shorter track can not be AGENT
     Args:
         data_scene: (pd.DataFrame)
-        agent_id: (int)
 
     Returns:
-        (pd.DataFrame)
+        (dict(str, np.ndarray)):
+            object_ids (O,): ids of objects in scene, sorted
+            objects (N,): index in object_ids of each row of scene
+            agents (A,): index in object_ids of each AGENT
+            in_range (A, O): is object in range of AGENT
     """
-    # get agent data
-    agent_data = data_scene.loc[data_scene["id"] == agent_id]
-    agent_at_2s = agent_data.iloc[FREQ * 2]
-
-    ts_at_2s = agent_at_2s["timestamp"]
-    agent_x = agent_at_2s["center_x"]
-    agent_y = agent_at_2s["center_y"]
-    data_at_2s = data_scene.loc[data_scene["timestamp"] == ts_at_2s]
-
-    # estimate distance of all objects to AGENT
-    data_at_2s = data_at_2s.apply(
-        estimate_distance,
-        axis=1,  # apply fow row
-        agent_x=agent_x,
-        agent_y=agent_y
-    )
-    # get objects in range
-    object_in_range = data_at_2s.loc[data_at_2s["distance"] <= RADIUS_AROUND_AGENT]
-    ids = object_in_range["id"].values.tolist()
-
-    return data_scene.loc[data_scene["id"].isin(ids)]
-
-
-def assign_av(
-        data_scene: pd.DataFrame,
-        agent_id: int
-):
+    object_ids, objects = np.unique(data_scene["id"].to_numpy(), return_inverse=True)
+    timestamps = data_scene["timestamp"].to_numpy()
+    positions = data_scene[["center_x", "center_y"]].to_numpy(dtype=np.float64)
+
+    # rank of each row in track of its object
+    counts = np.bincount(objects, minlength=len(object_ids))
+    order = np.argsort(objects, kind="stable")
+    ranks = np.empty(len(objects), dtype=np.int64)
+    ranks[order] = np.arange(len(objects)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # row of each AGENT at 2s
+    agent_rows = np.flatnonzero(ranks == FREQ * 2)
+    agent_rows = agent_rows[np.argsort(objects[agent_rows], kind="stable")]
+    agents = objects[agent_rows]
+
+    # distance matrix of AGENTs and objects of the same timestamp,
+    # one timestamp for all AGENTs unless some of them appear later in scene
+    in_range = np.zeros((len(agents), len(object_ids)), dtype=bool)
+    agent_timestamps = timestamps[agent_rows]
+    for timestamp in np.unique(agent_timestamps):
+        at_agents = np.flatnonzero(agent_timestamps == timestamp)
+        at_rows = np.flatnonzero(timestamps == timestamp)
+        diff = positions[agent_rows[at_agents], None, :] - positions[None, at_rows, :]
+        is_close = np.einsum("ijk,ijk->ij", diff, diff) <= RADIUS_AROUND_AGENT ** 2
+        i, j = np.nonzero(is_close)
+        in_range[at_agents[i], objects[at_rows[j]]] = True
+
+    return {
+        "object_ids": object_ids,
+        "objects": objects,
+        "agents": agents,
+        "in_range": in_range
+    }
+
+
+def get_roles(
+        neighbors: dict
+) -> tuple:
     """
-    Assign AV randomly in list_ids
-    that is not agent_id
+    Assign AV randomly among objects in range of each AGENT, that is not AGENT
+    Only AGENTs with >= 2 objects in range (AGENT included) are kept
     Args:
-        data_scene:
-        agent_id:
+        neighbors (dict(str, np.ndarray)): see get_objects_in_range()
 
     Returns:
-        (pd.DataFrame)
-        if return None -> scene has < 2 objects
+        (tuple):
+        (
+            np.ndarray: shape (A,), index of kept AGENTs in neighbors["agents"]
+            np.ndarray: shape (A, N), index in ROLES of each row of scene, -1 if not in range
+        )
     """
-    # get AGENT and the others
-    other_id = data_scene["id"].unique().tolist()
-    # only get scene with num_objects >= 2
-    if len(other_id) < 2:
-        return None
-    other_id.remove(agent_id)
-    # get AV, remove AV from other
-    av_id = np.random.choice(other_id)
-    other_id.remove(av_id)
-
-    # assign object type for objects in scene data
-    data_scene = data_scene.apply(
-        assign_object_type,
-        axis=1,  # apply for row
-        agent_id=agent_id,
-        av_id=av_id
-    )
-    return data_scene
+    agents = neighbors["agents"]
+    in_range = neighbors["in_range"]
+    kept = np.flatnonzero(in_range.sum(axis=1) >= 2)
+    agents = agents[kept]
+    in_range = in_range[kept]
+
+    # AV: candidate of largest random key
+    is_candidate = in_range.copy()
+    is_candidate[np.arange(len(agents)), agents] = False
+    keys = np.where(is_candidate, np.random.random(is_candidate.shape), -1.)
+    avs = np.argmax(keys, axis=1)
+
+    # roles of objects, then of rows
+    object_roles = np.where(in_range, 0, -1).astype(np.int8)
+    object_roles[np.arange(len(agents)), agents] = 1
+    object_roles[np.arange(len(agents)), avs] = 2
+    return kept, object_roles[:, neighbors["objects"]]
@@ -8,18 +8,32 @@ from omegaconf import DictConfig
 from agents.agent import Agent
 from agents.navigation.behavior_agent import BehaviorAgent
 
-from common.convert import vector3d_to_numpy
+from common.constants import LIGHT_STATES, NO_LIGHT_STATE
 import common.utils as utils
+from common.timing import timeit
 
 
 class AgentHandler:
     def __init__(
             self,
             configs: DictConfig,
-            world: carla.World
+            world: carla.World,
+            client: carla.Client = None,
+            checkpoint_agents: list = None
     ):
+        """
+        Args:
+            configs (DictConfig): config
+            world (carla.World): world to spawn actors in
+            client (carla.Client): if given, controls of a step are sent in one batch
+            checkpoint_agents (list(dict)): agents of a checkpoint, see get_checkpoint(),
+                if given, they are respawned with the same ids instead of random traffic
+        """
         self._configs = configs
         self._world = world
+        self._client = client
+        # actor id -> error of the latest failed control
+        self.control_errors = dict()
 
         self._map = self._world.get_map()
         self._blueprint = self._world.get_blueprint_library()
@@ -29,6 +43,8 @@ class AgentHandler:
         self._behaviors = ["cautious", "normal", "aggressive"]
 
         self._length = 0
+        # frame id of the latest sampled snapshot
+        self.last_frame = None
         # all spawned actors
         self.agents = {
             "car": [],
@@ -39,29 +55,35 @@ class AgentHandler:
         }
 
         # spawn actors
-        self._spawn_actors()
+        if checkpoint_agents is None:
+            self._spawn_actors()
+        else:
+            self._restore_actors(checkpoint_agents)
 
-    def _spawn(self, model_name, agent_type, behavior):
-        # get random transform in world
-        random_transform = np.random.choice(self._spawn_points)
-        self._spawn_points.remove(random_transform)
+    def _spawn(self, model_name, agent_type, behavior, transform=None, agent_id=None):
+        if transform is None:
+            # get random transform in world
+            transform = np.random.choice(self._spawn_points)
+            self._spawn_points.remove(transform)
+        if agent_id is None:
+            agent_id = self._length
         # get blueprint
         blueprint = self._blueprint.filter(model_name)[0]
         # create actor from blueprint and transform
-        actor = self._world.spawn_actor(blueprint, random_transform)
+        actor = self._world.spawn_actor(blueprint, transform)
         # set behavior for actor
         behavior_agent = BehaviorAgent(actor, behavior=behavior)
         # add to car container
         self.agents[agent_type].append(
             Agent(
-                id=self._length,
+                id=agent_id,
                 type=agent_type,
                 actor=actor,
                 behavior_agent=behavior_agent
             )
         )
         # increase length / index of agent in handler
-        self._length += 1
+        self._length = max(self._length, agent_id + 1)
 
     def _get_behavior(self):
         # return np.random.choice(self._behaviors)
@@ -123,52 +145,201 @@ class AgentHandler:
 
         # get traffic lights on map
         self._get_traffic_light()
+        # cache values to sample states
+        self._get_index()
 
+    def _restore_actors(self, checkpoint_agents):
+        """
+        Respawn agents of a checkpoint at their last transform, with the same ids
+        Traffic lights are matched to the nearest light of the map
+        """
+        for item in checkpoint_agents:
+            if item["type"] == "traffic_light":
+                continue
+            transform = carla.Transform(
+                carla.Location(x=item["x"], y=item["y"], z=item["z"] + 0.3),
+                carla.Rotation(yaw=item["yaw"])
+            )
+            try:
+                self._spawn(item["type_id"], item["type"], self._get_behavior(),
+                            transform=transform, agent_id=item["id"])
+            except RuntimeError as e:
+                print(f"agent {item['id']} is not restored: {e}")
+
+        tl_actors = list(self._world.get_actors().filter('traffic.traffic_light*'))
+        tl_locations = np.array([
+            (actor.get_location().x, actor.get_location().y)
+            for actor in tl_actors
+        ], dtype=np.float64).reshape((-1, 2))
+        for item in checkpoint_agents:
+            if item["type"] != "traffic_light" or len(tl_actors) == 0:
+                continue
+            distance = np.linalg.norm(tl_locations - (item["x"], item["y"]), axis=1)
+            self.agents["traffic_light"].append(
+                Agent(
+                    id=item["id"],
+                    type="traffic_light",
+                    actor=tl_actors[int(np.argmin(distance))]
+                )
+            )
+            self._length = max(self._length, item["id"] + 1)
+        # cache values to sample states
+        self._get_index()
+
+    def get_checkpoint(self) -> list:
+        """
+        Mapping of agent id to actor and its current transform,
+        enough to respawn agents when resuming a batch
+        Returns:
+            (list(dict)): id, type, actor_id, type_id, x, y, z, yaw of each agent
+        """
+        snapshot = self._world.get_snapshot()
+        result = []
+        for _, agents in self.agents.items():
+            for agent in agents:
+                a_snapshot = snapshot.find(agent.actor.id)
+                # actor is no longer alive
+                if a_snapshot is None:
+                    continue
+                transform = a_snapshot.get_transform()
+                result.append({
+                    "id": agent.id,
+                    "type": agent.type,
+                    "actor_id": agent.actor.id,
+                    "type_id": agent.actor.type_id,
+                    "x": transform.location.x,
+                    "y": transform.location.y,
+                    "z": transform.location.z,
+                    "yaw": transform.rotation.yaw
+                })
+        return result
+
+    @timeit("agent.run_step")
     def run_step(self):
-        for object_type, list_agents in self.agents.items():
-            for instance in list_agents:
-                instance.run_step()
+        if self._client is None:
+            for object_type, list_agents in self.agents.items():
+                for instance in list_agents:
+                    instance.run_step()
+            return
+
+        # one request for controls of all agents
+        commands = [
+            carla.command.ApplyVehicleControl(instance.actor, instance.get_control())
+            for instance in self._controlled_agents
+        ]
+        responses = self._client.apply_batch_sync(commands, False)
+        for response in responses:
+            if not response.has_error():
+                continue
+            # report each failing actor once per kind of error
+            if self.control_errors.get(response.actor_id) != response.error:
+                print(f"control of actor {response.actor_id} failed: {response.error}")
+            self.control_errors[response.actor_id] = response.error
 
-    def get_data_dynamic_state(self) -> pd.DataFrame:
+    def _get_index(self):
+        """
+        Cache per-agent values that do not change during collection
+        so that each sample only has to fill arrays
+        """
+        all_agents = [
+            agent
+            for _, agents in self.agents.items()
+            for agent in agents
+        ]
+        self._actor_ids = [agent.actor.id for agent in all_agents]
+        self._controlled_agents = [agent for agent in all_agents if agent.behavior_agent is not None]
+        self._agent_ids = np.array([agent.id for agent in all_agents], dtype=np.int64)
+        self._is_light = np.array([agent.type == "traffic_light" for agent in all_agents], dtype=bool)
+        self._light_actors = [agent.actor for agent in all_agents if agent.type == "traffic_light"]
+        self._light_codes = {name: code for code, name in enumerate(LIGHT_STATES)}
+
+    def _get_light_state(self) -> np.ndarray:
+        # light state is cached in client from the latest frame
+        unknown = self._light_codes["UNKNOWN"]
+        light_state = np.full(len(self._actor_ids), NO_LIGHT_STATE, dtype=np.int8)
+        light_state[self._is_light] = [
+            self._light_codes.get(str(actor.state).upper(), unknown)
+            for actor in self._light_actors
+        ]
+        return light_state
+
+    @timeit("agent.sample_state")
+    def get_data_dynamic_state(self, timestamp: float = None) -> dict:
         """
         Get data of all agent at the moment
+        All rows are taken from one world snapshot,
+        so they belong to the same simulation frame
         Each row should be:
                                                           # velocity / light state
         | timestamp | id | center_x | center_y | heading | status |
+        or with typed status:
+        | timestamp | id | center_x | center_y | heading | velocity | light_state |
+        Only columns in config.storage.dynamic_state.columns are returned
+        Args:
+            timestamp (float): timestamp of rows,
+                wall-clock time is used if None
         Returns:
-            pd.DataFrame
+            (dict(str, np.ndarray)): column name -> values
+            None if world has not moved to a new frame since last call
         """
         columns = self._configs.storage.dynamic_state.columns
-        now = time.time()
-        data = []
-        for a_type, agents in self.agents.items():
-            for agent in agents:
-                _id = int(agent.id)
-                _a_transform = agent.actor.get_transform()
-                _center_x = _a_transform.location.x
-                _center_y = _a_transform.location.y
-                _heading = float(np.radians(_a_transform.rotation.yaw))
-
-                if a_type == "traffic_light":
-                    # get status of light
-                    _status = json.dumps({"light_state": str(agent.actor.state).upper()})
-                else:
-                    # if its moving object
-                    # get scalar of velocity
-                    vel = float(np.linalg.norm(
-                        vector3d_to_numpy(agent.actor.get_velocity())
-                    ))
-                    _status = json.dumps({"velocity": vel})
-
-                row = [[now, _id,
-                        _center_x, _center_y,
-                        _heading, _status]]
-                # add row data
-                data += row
-
-        return pd.DataFrame(data, columns=columns)
-
-    def get_data_dynamic_property(self):
+        # one request for states of all actors
+        snapshot = self._world.get_snapshot()
+        # skip duplicated frame
+        if snapshot.frame == self.last_frame:
+            return None
+        self.last_frame = snapshot.frame
+
+        now = time.time() if timestamp is None else timestamp
+        # actor snapshot, indexed by actor id
+        # nan for actor that is no longer alive
+        nan_state = (np.nan,) * 6
+        states = []
+        for actor_id in self._actor_ids:
+            a_snapshot = snapshot.find(actor_id)
+            if a_snapshot is None:
+                states.append(nan_state)
+                continue
+            transform = a_snapshot.get_transform()
+            velocity = a_snapshot.get_velocity()
+            states.append((
+                transform.location.x, transform.location.y, transform.rotation.yaw,
+                velocity.x, velocity.y, velocity.z
+            ))
+        states = np.array(states, dtype=np.float64).reshape((-1, 6))
+        is_alive = ~np.isnan(states[:, 0])
+
+        # get scalar of velocity for moving object
+        speed = np.linalg.norm(states[:, 3:], axis=1).astype(np.float32)
+        speed[self._is_light] = np.nan
+
+        data = {
+            "timestamp": np.full(len(states), now, dtype=np.float64),
+            "frame": np.full(len(states), snapshot.frame, dtype=np.int64),
+            "id": self._agent_ids,
+            "center_x": states[:, 0],
+            "center_y": states[:, 1],
+            "heading": np.radians(states[:, 2]).astype(np.float32),
+            "velocity": speed,
+        }
+        if "light_state" in columns or "status" in columns:
+            data["light_state"] = self._get_light_state()
+        if "status" in columns:
+            # json status, kept for backward compatibility
+            data["status"] = np.array([
+                json.dumps({"light_state": LIGHT_STATES[code]})
+                if is_light
+                else json.dumps({"velocity": float(vel)})
+                for is_light, code, vel in zip(self._is_light, data["light_state"], speed)
+            ], dtype=object)
+
+        return {
+            col: data[col][is_alive]
+            for col in columns
+        }
+
+    @timeit("agent.sample_property")
+    def get_data_dynamic_property(self) -> pd.DataFrame:
         """
         Get property of dynamic object
         Columns should be:
@@ -177,22 +348,23 @@ class AgentHandler:
             pd.DataFrame
         """
         columns = self._configs.storage.dynamic_property.columns
-        data = pd.DataFrame(columns=columns)
+        all_agents = [
+            agent
+            for _, agents in self.agents.items()
+            for agent in agents
+        ]
+        extents = np.array([
+            (agent.actor.bounding_box.extent.y, agent.actor.bounding_box.extent.x)
+            for agent in all_agents
+        ], dtype=np.float64).reshape((-1, 2))
 
-        for _, agents in self.agents.items():
-            for agent in agents:
-                _id = int(agent.id)
-                _type = agent.type
-                _bbox = agent.actor.bounding_box
-                _width = _bbox.extent.y * 2
-                _length = _bbox.extent.x * 2
-
-                row = dict(zip(
-                    columns,
-                    [_id, _type,
-                     _width, _length]
-                ))
-                # add row data
-                data = data.append(row, ignore_index=True)
-
-        return data
+        data = {
+            "id": np.array([agent.id for agent in all_agents], dtype=np.int64),
+            "type": np.array([agent.type for agent in all_agents], dtype=object),
+            "width": extents[:, 0] * 2,
+            "length": extents[:, 1] * 2
+        }
+        return pd.DataFrame({
+            col: data[col]
+            for col in columns
+        })
@@ -1,6 +1,8 @@
 from omegaconf import DictConfig
 from maps.map import Map
+from maps.cache import MapCache, get_key
 from common.environment import Environment
+from common.timing import TIMINGS
 
 
 class MapHandler:
@@ -9,5 +11,20 @@ class MapHandler:
             config: DictConfig,
             env: Environment
     ):
-        self.map = Map(config, env)
-        self.data = self.map.get_dataframe()
+        # extracted map is reused from cache if town, server and components did not change
+        cache = None
+        if config.map_cache_folder is not None:
+            cache = MapCache(config.map_cache_folder)
+            key = get_key(config, env.client.get_server_version())
+            with TIMINGS.measure("map.cache_load", verbose=True):
+                cached = cache.load(key)
+            if cached is not None:
+                self.map, self.data = cached
+                return
+
+        with TIMINGS.measure("map.extract", verbose=True):
+            self.map = Map(config, env)
+        with TIMINGS.measure("map.dataframe", verbose=True):
+            self.data = self.map.get_dataframe()
+        if cache is not None:
+            cache.save(key, self.data, self.map)
@@ -0,0 +1,171 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+
+from common.shape import (
+    ListWaypoint,
+    Polyline,
+    Polygon,
+    Circle
+)
+from common.table_io import write_table, read_table
+from maps.lane_graph import LaneGraph, LANE_GRAPH_FILE_NAME
+
+# bump when extraction changes its output, so that old entries are not loaded
+CACHE_VERSION = 5
+
+
+class CachedMap:
+    """
+    Drawable shapes and lane graph of a map restored from cache,
+    same attributes as maps.map.Map, without carla objects
+    """
+
+    def __init__(
+            self,
+            list_polyline_waypoints: list,
+            list_polyline_lanes: list,
+            list_polygon_cws: list,
+            list_circle_ts: list,
+            lane_graph: LaneGraph
+    ):
+        self.list_polyline_waypoints = list_polyline_waypoints
+        self.list_polyline_lanes = list_polyline_lanes
+        self.list_polygon_cws = list_polygon_cws
+        self.list_circle_ts = list_circle_ts
+        self.lane_graph = lane_graph
+
+
+def get_key(
+        config: DictConfig,
+        server_version: str
+) -> str:
+    """
+    Key of extracted map, changes with anything the extraction depends on
+    Args:
+        config (DictConfig): config
+        server_version (str): version of carla server
+
+    Returns:
+        (str)
+    """
+    content = {
+        "cache_version": CACHE_VERSION,
+        "town": config.map.town,
+        "server_version": server_version,
+        "components": OmegaConf.to_container(config.components, resolve=True),
+        "static_columns": list(config.storage.static.columns),
+        "data_to_get": list(config.storage.data_to_get)
+    }
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"{config.map.town}_{digest}"
+
+
+def _pack(list_points: list) -> dict:
+    # concatenated points and number of points of each shape
+    return {
+        "points": np.concatenate(list_points).reshape((-1, 3)) if list_points else np.empty((0, 3)),
+        "lengths": np.array([len(points) for points in list_points], dtype=np.int64)
+    }
+
+
+def _unpack(points: np.ndarray, lengths: np.ndarray) -> list:
+    return np.split(points, np.cumsum(lengths)[:-1]) if len(lengths) > 0 else []
+
+
+class MapCache:
+    """
+    On-disk cache of extracted maps: static table and geometry of shapes to draw
+    One folder per key, written to a temporary folder then renamed,
+    so that parallel collections never read a partial entry
+    cache = MapCache(folder_path)
+    cached = cache.load(key)  # None if not cached
+    cache.save(key, data, map)
+    """
+
+    def __init__(self, folder_path: str):
+        self._folder_path = folder_path
+
+    def _get_entry(self, key: str) -> str:
+        return f"{self._folder_path}/{key}"
+
+    def load(self, key: str):
+        """
+        Args:
+            key (str): see get_key()
+
+        Returns:
+            (tuple(CachedMap, pd.DataFrame)): None if not cached
+        """
+        entry = self._get_entry(key)
+        if not os.path.exists(f"{entry}/geometry.npz"):
+            return None
+        data = read_table(f"{entry}/static.npz")
+        with np.load(f"{entry}/geometry.npz", allow_pickle=False) as f:
+            cached_map = CachedMap(
+                list_polyline_waypoints=[
+                    ListWaypoint(points)
+                    for points in _unpack(f["waypoints_points"], f["waypoints_lengths"])
+                ],
+                list_polyline_lanes=[
+                    Polyline(points, None, str(lane_type))
+                    for points, lane_type in zip(_unpack(f["lanes_points"], f["lanes_lengths"]), f["lane_types"])
+                ],
+                list_polygon_cws=[
+                    Polygon(points)
+                    for points in _unpack(f["crosswalks_points"], f["crosswalks_lengths"])
+                ],
+                list_circle_ts=[
+                    Circle(points, str(text))
+                    for points, text in zip(f["traffic_signs_points"], f["traffic_sign_texts"])
+                ],
+                lane_graph=LaneGraph.load(f"{entry}/{LANE_GRAPH_FILE_NAME}")
+            )
+        return cached_map, data
+
+    def save(
+            self,
+            key: str,
+            data: pd.DataFrame,
+            extracted_map
+    ):
+        """
+        Args:
+            key (str): see get_key()
+            data (pd.DataFrame): static table
+            extracted_map (maps.map.Map): extracted map, its shapes are saved for drawing
+        """
+        entry = self._get_entry(key)
+        if os.path.exists(entry):
+            return
+        if not os.path.exists(self._folder_path):
+            os.makedirs(self._folder_path, exist_ok=True)
+
+        arrays = dict()
+        for name, shapes in [
+            ("waypoints", extracted_map.list_polyline_waypoints),
+            ("lanes", extracted_map.list_polyline_lanes),
+            ("crosswalks", extracted_map.list_polygon_cws),
+            ("traffic_signs", extracted_map.list_circle_ts)
+        ]:
+            packed = _pack([np.asarray(shape.points, dtype=np.float64).reshape((-1, 3)) for shape in shapes])
+            arrays[f"{name}_points"] = packed["points"]
+            arrays[f"{name}_lengths"] = packed["lengths"]
+        arrays["lane_types"] = np.array([shape.lane_type for shape in extracted_map.list_polyline_lanes], dtype=str)
+        arrays["traffic_sign_texts"] = np.array([shape.text for shape in extracted_map.list_circle_ts], dtype=str)
+
+        tmp_entry = tempfile.mkdtemp(prefix=f".{key}_", dir=self._folder_path)
+        try:
+            write_table(data, f"{tmp_entry}/static", "npz")
+            np.savez_compressed(f"{tmp_entry}/geometry.npz", **arrays)
+            extracted_map.lane_graph.save(tmp_entry)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # entry is written by another collection at the same time
+            shutil.rmtree(tmp_entry, ignore_errors=True)
@@ -1,9 +1,8 @@
-import json
 from abc import abstractmethod, ABC
 from omegaconf import DictConfig
 import numpy as np
-import pandas as pd
 
+from common.constants import NO_INTERSECTION
 from common.shape import (
     Shape,
     Circle,
@@ -27,15 +26,42 @@ class MapComponent:
     @abstractmethod
     def _get_data(self):
         """
-        This should return a pd.DataFrame
+        This should return typed columns,
         each row is a point of polygon / list waypoints
         with columns like:
-        | id | type | x | y | status
+        | type | x | y | intersection
+        id is assigned later, when the whole map is gathered in Map.get_dataframe()
         Returns:
-            pd.DataFrame
+            dict(str, np.ndarray)
         """
         pass
 
+    @staticmethod
+    def _make_data(
+            points: np.ndarray,
+            object_type: str,
+            intersection: np.ndarray = None
+    ) -> dict:
+        """
+        Args:
+            points (np.ndarray): shape (N, 2+), x, y of each point
+            object_type (str): type of all points
+            intersection (np.ndarray): shape (N,), is each point in intersection,
+                NO_INTERSECTION for all if None
+
+        Returns:
+            dict(str, np.ndarray)
+        """
+        num_row = len(points)
+        if intersection is None:
+            intersection = np.full(num_row, NO_INTERSECTION, dtype=np.int8)
+        return {
+            "type": np.full(num_row, object_type, dtype=object),
+            "x": points[:, 0].astype(np.float64),
+            "y": points[:, 1].astype(np.float64),
+            "intersection": np.asarray(intersection, dtype=np.int8)
+        }
+
 
 class CrossWalk(MapComponent, ABC):
     def __init__(
@@ -52,20 +78,7 @@ class CrossWalk(MapComponent, ABC):
         super().__init__(config, shape)
 
     def _get_data(self):
-        # get x, y only
-        _points = self._shape.points[:, :2]
-        num_row = len(_points)
-        # id will be assigned later in MapHandler
-        _id = np.zeros((num_row, 1))
-        _type = np.array(["crosswalk"] * num_row).reshape((-1, 1))
-
-        # fill nan for status column
-        _status = np.empty((num_row, 1))
-        _status.fill(np.nan)
-
-        data = np.concatenate([_id, _type, _points, _status], axis=1)
-        df = pd.DataFrame(data=data, columns=self._config.storage.static.columns)
-        return df
+        return self._make_data(self._shape.points, "crosswalk")
 
 
 class Lane(MapComponent, ABC):
@@ -84,26 +97,9 @@ class Lane(MapComponent, ABC):
         super().__init__(config, shape)
 
     def _get_data(self):
-        _lane_type = self._shape.lane_type  # _shape is Polyline
-        _points = self._shape.points[:, :2]
-        num_row = len(_points)
-
-        # id will be assigned later in MapHandler
-        _id = np.zeros((num_row, 1))
-        _type = np.array([_lane_type] * num_row).reshape((-1, 1))
-        _status = np.empty((num_row, 1))
-
-        data = np.concatenate([_id, _type, _points, _status], axis=1)
-        df = pd.DataFrame(data=data, columns=self._config.storage.static.columns)
-
-        # update additional information in status column
-        for i, wp in enumerate(self._shape.waypoints):
-            df.loc[i]["status"] = json.dumps({
-                "intersection": wp.is_intersection
-                # has_traffic_control?
-                # turn?
-            })
-        return df
+        # _shape is Polyline, intersection of its waypoints
+        intersection = [wp.is_intersection for wp in self._shape.waypoints]
+        return self._make_data(self._shape.points, self._shape.lane_type, intersection)
 
 
 class Waypoint(MapComponent, ABC):
@@ -121,29 +117,8 @@ class Waypoint(MapComponent, ABC):
         super().__init__(config, shape)
 
     def _get_data(self):
-        # get x, y only
-        _points = self._shape.points[:, :2]
-        num_row = len(_points)
-        # id will be assigned later in MapHandler
-        _id = np.zeros((num_row, 1))
-        _type = np.array(["waypoint"] * num_row).reshape((-1, 1))
-
-        # fill nan for status column
-        _status = np.empty((num_row, 1))
-        _status.fill(np.nan)
-
-        data = np.concatenate([_id, _type, _points, _status], axis=1)
-        df = pd.DataFrame(data=data, columns=self._config.storage.static.columns)
-
-        # update additional information in status column
-        for i, wp in enumerate(self._shape.get_data()):
-            df.loc[i]["status"] = json.dumps({
-                "intersection": wp.is_intersection
-                # has_traffic_control?
-                # turn?
-            })
-
-        return df
+        intersection = [wp.is_intersection for wp in self._shape.get_data()]
+        return self._make_data(self._shape.points, "waypoint", intersection)
 
 
 class TrafficSign(MapComponent, ABC):
@@ -161,19 +136,4 @@ class TrafficSign(MapComponent, ABC):
         super().__init__(config, shape)
 
     def _get_data(self):
-        # get x, y only
-        _points = self._shape.points[:2].reshape((1, -1))
-        num_row = 1
-        # id will be assigned later in MapHandler
-        _id = np.zeros((num_row, 1))
-        # skip "traffic" in text
-        _ts_text = ".".join(self._shape.get_data().type_id.split(".")[1:])
-        _type = np.array([_ts_text] * num_row).reshape((-1, 1))
-
-        # fill nan for status column
-        _status = np.empty((num_row, 1))
-        _status.fill(np.nan)
-
-        data = np.concatenate([_id, _type, _points, _status], axis=1)
-        df = pd.DataFrame(data=data, columns=self._config.storage.static.columns)
-        return df
+        return self._make_data(self._shape.points[:2].reshape((1, -1)), self._shape.text)
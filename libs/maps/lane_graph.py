@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from maps.spatial_index import StaticIndex
+
+LANE_GRAPH_FILE_NAME = "lane_graph.npz"
+# end of a lane and start of its successor are the same point, up to this distance (meters)
+MATCH_TOLERANCE = 0.5
+# bits of lane_change, same as carla.LaneChange
+LANE_CHANGE_RIGHT = 1
+LANE_CHANGE_LEFT = 2
+
+# relations between lanes, each stored as CSR: <relation>_indptr, <relation>_indices
+# left / right: neighbor lanes a vehicle may change to (lane_change of lane allows it)
+# left_adjacent / right_adjacent: all neighbor lanes of the same direction, whatever the lane marking
+RELATIONS = ["successors", "predecessors", "left", "right", "left_adjacent", "right_adjacent"]
+
+
+def _to_csr(sources: np.ndarray, targets: np.ndarray, num_lanes: int) -> tuple:
+    # (indptr, indices): targets of lane i are indices[indptr[i]: indptr[i + 1]]
+    order = np.lexsort((targets, sources))
+    indptr = np.searchsorted(sources[order], np.arange(num_lanes + 1))
+    return indptr.astype(np.int64), targets[order].astype(np.int64)
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, lanes: np.ndarray) -> np.ndarray:
+    # concatenated rows of lanes in CSR
+    starts = indptr[lanes]
+    counts = indptr[lanes + 1] - starts
+    offsets = np.cumsum(counts) - counts
+    return indices[np.repeat(starts - offsets, counts) + np.arange(int(counts.sum()))]
+
+
+def _match_points(exits: np.ndarray, entries: np.ndarray) -> tuple:
+    # (i, j) pairs of exits[i] and entries[j] within MATCH_TOLERANCE
+    # candidates are found in x, y with the grid index, so memory grows with lanes, not lanes ** 2,
+    # then z is checked, stacked roads do not match
+    if len(exits) == 0 or len(entries) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    index = StaticIndex(
+        pd.DataFrame({"id": np.arange(len(entries)), "x": entries[:, 0], "y": entries[:, 1]}),
+        cell_size=max(10. * MATCH_TOLERANCE, 1.)
+    )
+    candidates = index.query_batch(exits[:, :2], MATCH_TOLERANCE, return_rows=True)
+    sources = np.repeat(np.arange(len(exits)), [len(rows) for rows in candidates])
+    targets = np.concatenate(candidates).astype(np.int64)
+    diff = exits[sources] - entries[targets]
+    is_close = np.einsum("ij,ij->i", diff, diff) <= MATCH_TOLERANCE ** 2
+    return sources[is_close], targets[is_close]
+
+
+class LaneGraph:
+    """
+    Lane graph of a map, only numpy arrays, so it can be traversed without carla or networkx
+    One node per lane of topology, with its centreline,
+    successors / predecessors / left / right neighbors are CSR index arrays,
+    left / right only where lane change is allowed, left_adjacent / right_adjacent regardless of it
+    graph = LaneGraph.load(f"{batch_folder}/lane_graph.npz")
+    points = graph.get_centerline(i)  # (N, 3)
+    next_lanes = graph.get_successors(i)
+    lanes, depths = graph.get_reachable([i], max_depth=3)
+    """
+
+    def __init__(self, arrays: dict):
+        """
+        Args:
+            arrays (dict(str, np.ndarray)):
+                points (P, 3) and lane_starts (L + 1,):
+                    centreline of lane i is points[lane_starts[i]: lane_starts[i + 1]]
+                road_id, section_id, lane_id, is_junction, lane_width, lane_change (L,): attributes of lanes
+                <relation>_indptr, <relation>_indices for each relation of RELATIONS
+        """
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(self.arrays["lane_starts"]) - 1
+
+    @classmethod
+    def from_lanes(
+            cls,
+            lane_waypoints: list,
+            points: np.ndarray
+    ):
+        """
+        Build lane graph from waypoints of topology
+        Args:
+            lane_waypoints (list(list(carla.Waypoint))): waypoints of each lane, from its start to its end
+            points (np.ndarray): shape (N, 3), locations of all waypoints, lane by lane
+
+        Returns:
+            (LaneGraph)
+        """
+        num_lanes = len(lane_waypoints)
+        lane_starts = np.r_[0, np.cumsum([len(waypoints) for waypoints in lane_waypoints])].astype(np.int64)
+        if len(points) != lane_starts[-1]:
+            raise ValueError(f"{len(points)} points for {lane_starts[-1]} waypoints of lanes")
+        first_waypoints = [waypoints[0] for waypoints in lane_waypoints]
+        arrays = {
+            "points": np.asarray(points, dtype=np.float64).reshape((-1, 3)),
+            "lane_starts": lane_starts,
+            "road_id": np.array([wp.road_id for wp in first_waypoints], dtype=np.int64),
+            "section_id": np.array([wp.section_id for wp in first_waypoints], dtype=np.int64),
+            "lane_id": np.array([wp.lane_id for wp in first_waypoints], dtype=np.int64),
+            "is_junction": np.array([wp.is_junction for wp in first_waypoints], dtype=bool),
+            "lane_width": np.array([wp.lane_width for wp in first_waypoints], dtype=np.float64),
+            "lane_change": np.array([int(wp.lane_change) for wp in first_waypoints], dtype=np.int8),
+        }
+
+        # successor: its start is the end of lane
+        sources, targets = _match_points(
+            arrays["points"][lane_starts[1:] - 1],
+            arrays["points"][lane_starts[:-1]]
+        )
+        arrays["successors_indptr"], arrays["successors_indices"] = _to_csr(sources, targets, num_lanes)
+        arrays["predecessors_indptr"], arrays["predecessors_indices"] = _to_csr(targets, sources, num_lanes)
+
+        # left / right: neighbor lane of the same direction, found by (road, section, lane)
+        lane_index = dict()
+        for i, wp in enumerate(first_waypoints):
+            lane_index.setdefault((wp.road_id, wp.section_id, wp.lane_id), i)
+        for relation, get_neighbor, lane_change in [
+            ("left", lambda wp: wp.get_left_lane(), LANE_CHANGE_LEFT),
+            ("right", lambda wp: wp.get_right_lane(), LANE_CHANGE_RIGHT)
+        ]:
+            pairs = []
+            for i, wp in enumerate(first_waypoints):
+                neighbor = get_neighbor(wp)
+                # lane ids of the same direction have the same sign
+                if neighbor is None or neighbor.lane_id * wp.lane_id <= 0:
+                    continue
+                j = lane_index.get((neighbor.road_id, neighbor.section_id, neighbor.lane_id))
+                if j is not None:
+                    pairs.append((i, j))
+            pairs = np.array(pairs, dtype=np.int64).reshape((-1, 2))
+            arrays[f"{relation}_adjacent_indptr"], arrays[f"{relation}_adjacent_indices"] = _to_csr(
+                pairs[:, 0], pairs[:, 1], num_lanes
+            )
+            # lane change marking (Left, Right or Both) of lane allows the move
+            is_allowed = (arrays["lane_change"][pairs[:, 0]] & lane_change) > 0
+            pairs = pairs[is_allowed]
+            arrays[f"{relation}_indptr"], arrays[f"{relation}_indices"] = _to_csr(pairs[:, 0], pairs[:, 1], num_lanes)
+        return cls(arrays)
+
+    def get_centerline(self, lane: int) -> np.ndarray:
+        """
+        Returns:
+            (np.ndarray): shape (N, 3), x, y, z of centreline of lane
+        """
+        lane_starts = self.arrays["lane_starts"]
+        return self.arrays["points"][lane_starts[lane]: lane_starts[lane + 1]]
+
+    def get_related(self, lanes, relation: str) -> np.ndarray:
+        """
+        Args:
+            lanes (int | list(int) | np.ndarray): indices of lanes
+            relation (str): one of RELATIONS
+
+        Returns:
+            (np.ndarray): related lanes of all lanes, concatenated
+        """
+        if relation not in RELATIONS:
+            raise ValueError(f"unknown relation {relation}, should be one of {RELATIONS}")
+        return _gather(
+            self.arrays[f"{relation}_indptr"],
+            self.arrays[f"{relation}_indices"],
+            np.atleast_1d(np.asarray(lanes, dtype=np.int64))
+        )
+
+    def get_successors(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "successors")
+
+    def get_predecessors(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "predecessors")
+
+    def get_left(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "left")
+
+    def get_right(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "right")
+
+    def get_left_adjacent(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "left_adjacent")
+
+    def get_right_adjacent(self, lane: int) -> np.ndarray:
+        return self.get_related(lane, "right_adjacent")
+
+    def get_reachable(
+            self,
+            lanes,
+            max_depth: int,
+            relation: str = "successors"
+    ) -> tuple:
+        """
+        Breadth-first traversal, one frontier of lanes at a time
+        Args:
+            lanes (list(int) | np.ndarray): start lanes
+            max_depth (int): number of steps
+            relation (str): followed relation, successors or predecessors for routes
+
+        Returns:
+            (tuple):
+            (
+                np.ndarray: reached lanes, start lanes included
+                np.ndarray: depth of each reached lane
+            )
+        """
+        depths = np.full(len(self), -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(lanes, dtype=np.int64))
+        depths[frontier] = 0
+        for depth in range(1, max_depth + 1):
+            frontier = np.unique(self.get_related(frontier, relation))
+            frontier = frontier[depths[frontier] < 0]
+            if len(frontier) == 0:
+                break
+            depths[frontier] = depth
+        reached = np.flatnonzero(depths >= 0)
+        return reached, depths[reached]
+
+    def save(self, folder_path: str) -> str:
+        """
+        Save lane graph next to static table
+        Returns:
+            (str): path of saved graph
+        """
+        file_path = f"{folder_path}/{LANE_GRAPH_FILE_NAME}"
+        np.savez_compressed(file_path, **self.arrays)
+        return file_path
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Args:
+            file_path (str): graph saved by save()
+
+        Returns:
+            (LaneGraph)
+        """
+        with np.load(file_path, allow_pickle=False) as f:
+            return cls({name: f[name] for name in f.files})
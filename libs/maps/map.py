@@ -1,8 +1,11 @@
-import carla
+import json
+
+import numpy as np
 import pandas as pd
 from omegaconf import DictConfig
 
 from common.environment import Environment
+from common.convert import transforms_to_numpy, lateral_points
 from common.shape import (
     ListWaypoint,
     # ListLanePoint,
@@ -11,6 +14,7 @@ from common.shape import (
     Circle
 )
 
+from maps.lane_graph import LaneGraph
 from maps.components import (
     Waypoint,
     Lane,
@@ -31,89 +35,85 @@ class Map:
 
         self._get_data()
 
-    def _get_chunk_of_waypoints(
+    def _get_lane_waypoints(
             self,
-            topology: list,
+            topology: list
     ) -> list:
         """
-        Separate list of waypoints into chunks
-        Each chunk has "num_wp_per_chunk" points
+        Waypoints of each segment of topology, until end of its lane
+        Taken in one call (next_until_lane_end), instead of one next() per waypoint
         Args:
             topology (list(tuple(carla.Waypoint))):
                 list of waypoint pairs in topology
 
+        Returns:
+            (list(list(carla.Waypoint))): waypoints of each lane
+        """
+        sampling_distance = self._config.components.waypoints.distance
+        return [
+            [w1] + w1.next_until_lane_end(sampling_distance)
+            for w1, _ in topology
+        ]
+
+    def _get_chunk_of_waypoints(
+            self,
+            lane_waypoints: list,
+    ) -> list:
+        """
+        Separate list of waypoints into chunks
+        Each chunk has "num_wp_per_chunk" points, last chunk of a lane has the rest,
+        lanes of less than 2 points are dropped
+        Args:
+            lane_waypoints (list(list(carla.Waypoint))):
+                waypoints of each lane, see _get_lane_waypoints()
+
         Returns:
             (list(list(carla.Waypoint))):
                 Contains list of small chunks
         """
         containers = []
-        sampling_distance = self._config.components.waypoints.distance
         num_points = self._config.components.waypoints.num_wp_per_chunk
-        # TODO: to be improved later
-        for w1, w2 in topology:
-            # create chunk to store items
-            chunk = []
-
-            end_loc = w2.transform.location
-            curr_w = w1
-            is_last = False
-
-            # do while loop to get chunks
-            while True:
-                d_cur_w2 = curr_w.transform.location.distance(end_loc)
-                # flag to denote this is the last polygon
-                if d_cur_w2 < sampling_distance * num_points:
-                    is_last = True
-
-                for _ in range(num_points):
-                    # add waypoint to chunk
-                    chunk.append(curr_w)
-                    next_w = curr_w.next(sampling_distance)[0]
-                    curr_w = next_w
-
-                # add chunk to containers
-                containers.append(chunk)
-                # empty chunk for next one
-                chunk = []
-                # break if meet last polygon
-                if is_last:
-                    break
+        for waypoints in lane_waypoints:
+            num_waypoints = len(waypoints)
+            # a lane of 1 point is not a polyline, it is only kept in lane graph
+            if num_waypoints < 2:
+                continue
+
+            # cut into chunks, a last chunk of 1 point is merged into previous one,
+            # since a polyline needs at least 2 points
+            starts = np.arange(0, num_waypoints, num_points)
+            if len(starts) > 1 and num_waypoints - starts[-1] < 2:
+                starts = starts[:-1]
+            ends = np.append(starts[1:], num_waypoints)
+            containers += [
+                waypoints[start: end]
+                for start, end in zip(starts, ends)
+            ]
         return containers
 
     @staticmethod
     def _get_left_right_lane(
-            _chunk: list
+            locations: np.ndarray,
+            rotations: np.ndarray,
+            lane_widths: np.ndarray
     ) -> tuple:
         """
-        Get left lane and right lane
+        Get left lane and right lane of waypoints, for the whole map at once
         Args:
-            _chunk (list(carla.Waypoint)):
-                List waypoints
+            locations (np.ndarray): shape (N, 3), locations of waypoints
+            rotations (np.ndarray): shape (N, 3), pitch, yaw, roll of waypoints
+            lane_widths (np.ndarray): shape (N,)
         Returns:
             (tuple):
             (
-                list(carla.Location): list location of left_lane
-                list(carla.Location): list location of right_lane
+                np.ndarray: shape (N, 3), points of left_lane
+                np.ndarray: shape (N, 3), points of right_lane
             )
         """
-        l_lanes = []
-        r_lanes = []
-
-        for i, wp in enumerate(_chunk):
-            transform = wp.transform
-
-            # lane width
-            lane_width = wp.lane_width
-            l_point = carla.Vector3D(0, -lane_width / 2, 0)
-            r_point = carla.Vector3D(0, lane_width / 2, 0)
-
-            global_l_point = transform.transform(l_point)
-            global_r_point = transform.transform(r_point)
-
-            l_lanes.append(global_l_point)
-            r_lanes.append(global_r_point)
-
-        return l_lanes, r_lanes
+        return (
+            lateral_points(locations, rotations, -lane_widths / 2),
+            lateral_points(locations, rotations, lane_widths / 2)
+        )
 
     def _get_data(self):
         # data from carla
@@ -123,7 +123,8 @@ class Map:
         # )
 
         _topology = self._env.map.get_topology()
-        _chunk_waypoints = self._get_chunk_of_waypoints(topology=_topology)
+        _lane_waypoints = self._get_lane_waypoints(topology=_topology)
+        _chunk_waypoints = self._get_chunk_of_waypoints(lane_waypoints=_lane_waypoints)
 
         # crosswalks
         _crosswalk = self._env.map.get_crosswalks()
@@ -136,11 +137,28 @@ class Map:
 
         # -----
         # convert to my data
-        self.list_polyline_waypoints = [ListWaypoint(_chunk) for _chunk in _chunk_waypoints]
+        # arrays of all waypoints of map, lane by lane
+        _locations, _rotations = transforms_to_numpy([wp.transform for _lane in _lane_waypoints for wp in _lane])
+        _lane_widths = np.array([wp.lane_width for _lane in _lane_waypoints for wp in _lane], dtype=np.float64)
+        self.lane_graph = LaneGraph.from_lanes(_lane_waypoints, _locations)
+
+        # chunks cover lanes of >= 2 points in order, see _get_chunk_of_waypoints(),
+        # so their points are these of kept lanes, then split back into chunks
+        _lane_sizes = np.array([len(_lane) for _lane in _lane_waypoints], dtype=np.int64)
+        _is_chunked = np.repeat(_lane_sizes >= 2, _lane_sizes)
+        _locations = _locations[_is_chunked]
+        _rotations = _rotations[_is_chunked]
+        _lane_widths = _lane_widths[_is_chunked]
+        _l_lanes, _r_lanes = self._get_left_right_lane(_locations, _rotations, _lane_widths)
+        _splits = np.cumsum([len(_chunk) for _chunk in _chunk_waypoints])[:-1]
+
+        self.list_polyline_waypoints = [
+            ListWaypoint(_chunk, points)
+            for _chunk, points in zip(_chunk_waypoints, np.split(_locations, _splits))
+        ]
 
         self.list_polyline_lanes = []
-        for _chunk in _chunk_waypoints:
-            l_lane, r_lane = self._get_left_right_lane(_chunk)
+        for _chunk, l_lane, r_lane in zip(_chunk_waypoints, np.split(_l_lanes, _splits), np.split(_r_lanes, _splits)):
             self.list_polyline_lanes.append(Polyline(l_lane, _chunk, "l_lane"))
             self.list_polyline_lanes.append(Polyline(r_lane, _chunk, "r_lane"))
 
@@ -185,28 +203,42 @@ class Map:
 
     def get_dataframe(self) -> pd.DataFrame:
         """
-        Get dataframe from static map
+        Get dataframe from static map, built once from columns of all components
         columns should be:
+        | id | type | x | y | intersection
+        or, with json status:
         | id | type | x | y | status
         Returns:
             pd.DataFrame
         """
-        data = pd.DataFrame(columns=self._config.storage.static.columns)
-        # counter for id
-        counter = 0
-        for k, component in self._components.items():
-            # only get data in config.storage.data_to_get
-            if k not in self._config.storage.data_to_get:
-                continue
-
-            for instance in component:
-                ins_data = instance.data
-                # assign id by counter
-                ins_data["id"] = counter
-                data = pd.concat(
-                    [data, ins_data],
-                    ignore_index=True
-                )
-                # update counter for id
-                counter += 1
-        return data
+        columns = self._config.storage.static.columns
+        # only get data in config.storage.data_to_get
+        instances = [
+            instance.data
+            for k, component in self._components.items()
+            if k in self._config.storage.data_to_get
+            for instance in component
+        ]
+        if len(instances) == 0:
+            return pd.DataFrame(columns=columns)
+
+        data = {
+            col: np.concatenate([ins_data[col] for ins_data in instances])
+            for col in ["type", "x", "y", "intersection"]
+        }
+        # id is index of instance
+        data["id"] = np.repeat(
+            np.arange(len(instances), dtype=np.int64),
+            [len(ins_data["x"]) for ins_data in instances]
+        )
+        if "status" in columns:
+            # json, kept for backward compatibility
+            status = np.full(len(data["x"]), np.nan, dtype=object)
+            for value in [0, 1]:
+                status[data["intersection"] == value] = json.dumps({"intersection": bool(value)})
+            data["status"] = status
+
+        return pd.DataFrame({
+            col: data[col]
+            for col in columns
+        })
@@ -0,0 +1,196 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.table_io import read_table, find_table
+
+INDEX_FILE_NAME = "static_index.npz"
+
+
+class StaticIndex:
+    """
+    Uniform grid over points of static map, to find map elements around a position
+    without scanning the whole static table
+    Points are sorted by cell, each cell is a range of sorted points (like CSR),
+    so a query only reads cells overlapping the circle
+    index = StaticIndex(static)  # or StaticIndex.from_folder(batch_folder)
+    ids = index.query(center=(10., 20.), radius=30.)  # ids of polylines / polygons
+    list_ids = index.query_batch(centers, radius=30.)  # one array per center
+    index.save(batch_folder)
+    """
+
+    def __init__(
+            self,
+            data: pd.DataFrame,
+            cell_size: float = 10.
+    ):
+        """
+        Args:
+            data (pd.DataFrame): static table, see Map.get_dataframe(), needs id, x, y
+            cell_size (float): side of grid cells in meters,
+                around the radius of usual queries
+        """
+        if cell_size <= 0:
+            raise ValueError(f"cell_size should be positive, got {cell_size}")
+        self.cell_size = float(cell_size)
+        xy = data[["x", "y"]].to_numpy(dtype=np.float64)
+        ids = data["id"].to_numpy(dtype=np.int64)
+
+        if len(xy) > 0:
+            self._origin = xy.min(axis=0)
+            self._shape = (np.floor((xy.max(axis=0) - self._origin) / self.cell_size).astype(np.int64) + 1)
+        else:
+            self._origin = np.zeros(2)
+            self._shape = np.ones(2, dtype=np.int64)
+
+        cells = self._get_cells(xy)
+        # stable: points of a polyline stay in order in each cell
+        order = np.argsort(cells, kind="stable")
+        self._xy = xy[order]
+        self._ids = ids[order]
+        # row of each sorted point in data
+        self._rows = order.astype(np.int64)
+        # points of cell k are self._xy[self._cell_starts[k]: self._cell_starts[k + 1]]
+        self._cell_starts = np.searchsorted(cells[order], np.arange(self._shape.prod() + 1))
+
+    def _get_cells(self, xy: np.ndarray) -> np.ndarray:
+        ij = np.floor((xy - self._origin) / self.cell_size).astype(np.int64)
+        return ij[:, 0] * self._shape[1] + ij[:, 1]
+
+    def __len__(self):
+        return len(self._xy)
+
+    def query(
+            self,
+            center,
+            radius: float,
+            return_rows: bool = False
+    ) -> np.ndarray:
+        """
+        Args:
+            center (tuple(float) | np.ndarray): x, y
+            radius (float): in meters
+            return_rows (bool): return rows of points in static table instead of ids
+
+        Returns:
+            (np.ndarray): sorted ids of map elements having a point within radius,
+                or rows of these points if return_rows
+        """
+        return self.query_batch(np.asarray(center, dtype=np.float64).reshape((1, 2)), radius, return_rows)[0]
+
+    def query_batch(
+            self,
+            centers: np.ndarray,
+            radius: float,
+            return_rows: bool = False
+    ) -> list:
+        """
+        Query many centers at once, candidates of all centers are gathered and filtered together
+        Args:
+            centers (np.ndarray): shape (M, 2), x, y of each center
+            radius (float): in meters
+            return_rows (bool): return rows of points in static table instead of ids
+
+        Returns:
+            (list(np.ndarray)): result of query() for each center
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape((-1, 2))
+        num_centers = len(centers)
+        if num_centers == 0:
+            return []
+
+        # cells of the square around each circle, clipped to grid
+        # in a row of the grid, these cells are one range of sorted points
+        lo = np.floor((centers - radius - self._origin) / self.cell_size).astype(np.int64)
+        hi = np.floor((centers + radius - self._origin) / self.cell_size).astype(np.int64)
+        is_valid = np.all((hi >= 0) & (lo < self._shape), axis=1)
+        lo = np.clip(lo, 0, self._shape - 1)
+        hi = np.clip(hi, 0, self._shape - 1)
+        num_rows = np.where(is_valid, hi[:, 0] - lo[:, 0] + 1, 0)
+
+        # one range of points per (center, row of grid)
+        row_center = np.repeat(np.arange(num_centers), num_rows)
+        row_i = lo[row_center, 0] + np.arange(len(row_center)) - np.repeat(np.cumsum(num_rows) - num_rows, num_rows)
+        starts = self._cell_starts[row_i * self._shape[1] + lo[row_center, 1]]
+        counts = self._cell_starts[row_i * self._shape[1] + hi[row_center, 1] + 1] - starts
+
+        # candidate points of all ranges: positions in sorted points and their center
+        total = int(counts.sum())
+        range_offsets = np.cumsum(counts) - counts
+        positions = np.repeat(starts - range_offsets, counts) + np.arange(total)
+        center_index = np.repeat(row_center, counts)
+
+        diff = self._xy[positions] - centers[center_index]
+        is_inside = np.einsum("ij,ij->i", diff, diff) <= radius ** 2
+        positions = positions[is_inside]
+        center_index = center_index[is_inside]
+
+        values = self._rows[positions] if return_rows else self._ids[positions]
+        # unique (center, value) pairs, sorted by center then value
+        num_values = int(values.max()) + 1 if len(values) > 0 else 1
+        keys = np.unique(center_index * num_values + values)
+        splits = np.searchsorted(keys // num_values, np.arange(1, num_centers))
+        return np.split(keys % num_values, splits)
+
+    def save(self, folder_path: str) -> str:
+        """
+        Save index next to static table of a batch
+        Returns:
+            (str): path of saved index
+        """
+        file_path = f"{folder_path}/{INDEX_FILE_NAME}"
+        np.savez_compressed(
+            file_path,
+            cell_size=self.cell_size,
+            origin=self._origin,
+            shape=self._shape,
+            xy=self._xy,
+            ids=self._ids,
+            rows=self._rows,
+            cell_starts=self._cell_starts
+        )
+        return file_path
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Args:
+            file_path (str): index saved by save()
+
+        Returns:
+            (StaticIndex)
+        """
+        index = cls.__new__(cls)
+        with np.load(file_path, allow_pickle=False) as f:
+            index.cell_size = float(f["cell_size"])
+            index._origin = f["origin"]
+            index._shape = f["shape"]
+            index._xy = f["xy"]
+            index._ids = f["ids"]
+            index._rows = f["rows"]
+            index._cell_starts = f["cell_starts"]
+        return index
+
+    @classmethod
+    def from_folder(
+            cls,
+            folder_path: str,
+            cell_size: float = 10.
+    ):
+        """
+        Load index of a batch (or all_batches) folder,
+        built from its static table and saved if not saved yet
+        Args:
+            folder_path (str): folder containing static table
+            cell_size (float): side of grid cells, only used when building
+
+        Returns:
+            (StaticIndex)
+        """
+        file_path = f"{folder_path}/{INDEX_FILE_NAME}"
+        if os.path.exists(file_path):
+            return cls.load(file_path)
+        index = cls(read_table(find_table(folder_path, "static"), columns=["id", "x", "y"]), cell_size)
+        index.save(folder_path)
+        return index
@@ -0,0 +1,25 @@
+import os
+import sys
+
+
+def install():
+    """
+    Register the stand-in as "carla" module,
+    must be called before anything imports carla
+    e.g. to run offline:
+        import stand_in
+        stand_in.install()
+        from collection.data_collection import DataCollection
+    or put libs/stand_in in PYTHONPATH before the real carla
+    Returns:
+        stand-in carla module
+    """
+    stand_in_folder = os.path.dirname(os.path.abspath(__file__))
+    loaded = sys.modules.get("carla")
+    if loaded is not None and not getattr(loaded, "__file__", "").startswith(stand_in_folder):
+        raise ImportError("real carla was imported before stand_in.install()")
+
+    if stand_in_folder not in sys.path:
+        sys.path.insert(0, stand_in_folder)
+    import carla
+    return carla
@@ -0,0 +1,40 @@
+"""
+In-process stand-in of the carla python API (0.9.11)
+Only the subset used by this project is implemented,
+on a synthetic grid town with simple kinematics, see stand_in.install()
+"""
+from . import command
+from .geometry import (
+    Vector3D,
+    Location,
+    Rotation,
+    Transform,
+    BoundingBox
+)
+from .road import (
+    LaneType,
+    LaneChange,
+    LaneMarking,
+    LaneMarkingType,
+    LaneMarkingColor,
+    Waypoint,
+    Map
+)
+from .world import (
+    TrafficLightState,
+    VehicleControl,
+    WorldSettings,
+    Timestamp,
+    ActorSnapshot,
+    WorldSnapshot,
+    ActorBlueprint,
+    BlueprintLibrary,
+    ActorList,
+    Actor,
+    Vehicle,
+    TrafficSign,
+    TrafficLight,
+    DebugHelper,
+    World,
+    Client
+)
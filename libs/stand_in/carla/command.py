@@ -0,0 +1,26 @@
+"""
+carla.command, batch commands applied by Client.apply_batch(_sync)
+"""
+
+
+class Response:
+    def __init__(self, actor_id=0, error=""):
+        self.actor_id = actor_id
+        self.error = error
+
+    def has_error(self):
+        return bool(self.error)
+
+
+class ApplyVehicleControl:
+    def __init__(self, actor, control):
+        # actor or id of actor
+        self.actor_id = actor if isinstance(actor, int) else actor.id
+        self.control = control
+
+    def _apply(self, world):
+        vehicle = world._vehicles.get(self.actor_id)
+        if vehicle is None:
+            return Response(self.actor_id, f"unable to find actor {self.actor_id}")
+        vehicle.apply_control(self.control)
+        return Response(self.actor_id)
@@ -0,0 +1,133 @@
+import math
+
+
+class Vector3D:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        return self.__class__(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return self.__class__(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, k):
+        return self.__class__(self.x * k, self.y * k, self.z * k)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k):
+        return self.__class__(self.x / k, self.y / k, self.z / k)
+
+    def __eq__(self, other):
+        return isinstance(other, Vector3D) \
+            and self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(x={self.x:.6f}, y={self.y:.6f}, z={self.z:.6f})"
+
+    def length(self):
+        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def squared_length(self):
+        return self.x ** 2 + self.y ** 2 + self.z ** 2
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def make_unit_vector(self):
+        norm = self.length()
+        if norm == 0:
+            return Vector3D()
+        return Vector3D(self.x / norm, self.y / norm, self.z / norm)
+
+    def distance(self, other):
+        return math.sqrt(
+            (self.x - other.x) ** 2 +
+            (self.y - other.y) ** 2 +
+            (self.z - other.z) ** 2
+        )
+
+
+class Location(Vector3D):
+    pass
+
+
+class Rotation:
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = float(pitch)
+        self.yaw = float(yaw)
+        self.roll = float(roll)
+
+    def __eq__(self, other):
+        return isinstance(other, Rotation) \
+            and self.pitch == other.pitch and self.yaw == other.yaw and self.roll == other.roll
+
+    def __hash__(self):
+        return hash((self.pitch, self.yaw, self.roll))
+
+    def __repr__(self):
+        return f"Rotation(pitch={self.pitch:.6f}, yaw={self.yaw:.6f}, roll={self.roll:.6f})"
+
+    # only yaw is used on a flat world
+    def get_forward_vector(self):
+        yaw = math.radians(self.yaw)
+        return Vector3D(math.cos(yaw), math.sin(yaw), 0.0)
+
+    def get_right_vector(self):
+        yaw = math.radians(self.yaw)
+        return Vector3D(-math.sin(yaw), math.cos(yaw), 0.0)
+
+    def get_up_vector(self):
+        return Vector3D(0.0, 0.0, 1.0)
+
+
+class Transform:
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+    def __eq__(self, other):
+        return isinstance(other, Transform) \
+            and self.location == other.location and self.rotation == other.rotation
+
+    def __hash__(self):
+        return hash((self.location, self.rotation))
+
+    def __repr__(self):
+        return f"Transform({self.location}, {self.rotation})"
+
+    def transform(self, point):
+        """
+        Local point -> global point, rotated by yaw
+        """
+        yaw = math.radians(self.rotation.yaw)
+        cos_yaw, sin_yaw = math.cos(yaw), math.sin(yaw)
+        return Location(
+            self.location.x + point.x * cos_yaw - point.y * sin_yaw,
+            self.location.y + point.x * sin_yaw + point.y * cos_yaw,
+            self.location.z + point.z
+        )
+
+    def get_forward_vector(self):
+        return self.rotation.get_forward_vector()
+
+    def get_right_vector(self):
+        return self.rotation.get_right_vector()
+
+    def get_up_vector(self):
+        return self.rotation.get_up_vector()
+
+
+class BoundingBox:
+    def __init__(self, location=None, extent=None):
+        self.location = location if location is not None else Location()
+        self.extent = extent if extent is not None else Vector3D()
+
+    def __repr__(self):
+        return f"BoundingBox({self.location}, Extent({self.extent}))"
@@ -0,0 +1,357 @@
+import math
+from enum import IntEnum, IntFlag
+
+import numpy as np
+
+from .geometry import Vector3D, Location, Rotation, Transform
+
+
+class LaneType(IntFlag):
+    NONE = 1
+    Driving = 2
+    Stop = 4
+    Shoulder = 8
+    Biking = 16
+    Sidewalk = 32
+    Any = 0xFFFFFFFE
+
+
+class LaneChange(IntFlag):
+    NONE = 0
+    Right = 1
+    Left = 2
+    Both = 3
+
+
+class LaneMarkingType(IntEnum):
+    NONE = 0
+    Broken = 2
+    Solid = 3
+
+
+class LaneMarkingColor(IntEnum):
+    Standard = 0
+    White = 0
+    Yellow = 2
+
+
+class LaneMarking:
+    def __init__(self, marking_type=LaneMarkingType.Solid, lane_change=LaneChange.NONE, width=0.15):
+        self.type = marking_type
+        self.color = LaneMarkingColor.White
+        self.lane_change = lane_change
+        self.width = width
+
+
+class _Lane:
+    """
+    Straight piece of lane, waypoint on it is (lane, s)
+    """
+
+    def __init__(self, road_id, lane_id, start, end, width, is_junction=False, junction_id=-1):
+        self.road_id = road_id
+        self.section_id = 0
+        self.lane_id = lane_id
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.length = float(np.linalg.norm(self.end - self.start))
+        self.direction = (self.end - self.start) / max(self.length, 1e-9)
+        self.yaw = math.degrees(math.atan2(self.direction[1], self.direction[0]))
+        self.width = width
+        self.is_junction = is_junction
+        self.junction_id = junction_id
+        self.successors = []
+        self.predecessors = []
+        # lane of opposite direction on the same road
+        self.left = None
+
+
+class Waypoint:
+    def __init__(self, lane: _Lane, s: float):
+        self._lane = lane
+        self.s = float(min(max(s, 0.0), lane.length))
+        self._transform = None
+
+    def __repr__(self):
+        return f"Waypoint(road_id={self.road_id}, lane_id={self.lane_id}, s={self.s:.2f})"
+
+    @property
+    def id(self):
+        return hash((self.road_id, self.section_id, self.lane_id, round(self.s, 2)))
+
+    @property
+    def transform(self):
+        if self._transform is None:
+            x, y = self._lane.start + self._lane.direction * self.s
+            self._transform = Transform(Location(x, y, 0.0), Rotation(yaw=self._lane.yaw))
+        return self._transform
+
+    @property
+    def road_id(self):
+        return self._lane.road_id
+
+    @property
+    def section_id(self):
+        return self._lane.section_id
+
+    @property
+    def lane_id(self):
+        return self._lane.lane_id
+
+    @property
+    def junction_id(self):
+        return self._lane.junction_id
+
+    @property
+    def is_junction(self):
+        return self._lane.is_junction
+
+    @property
+    def is_intersection(self):
+        return self._lane.is_junction
+
+    @property
+    def lane_width(self):
+        return self._lane.width
+
+    @property
+    def lane_type(self):
+        return LaneType.Driving
+
+    @property
+    def lane_change(self):
+        return LaneChange.NONE
+
+    @property
+    def left_lane_marking(self):
+        return LaneMarking(LaneMarkingType.Solid, LaneChange.NONE)
+
+    @property
+    def right_lane_marking(self):
+        return LaneMarking(LaneMarkingType.Solid, LaneChange.NONE)
+
+    def next(self, distance):
+        s = self.s + distance
+        if s <= self._lane.length:
+            return [Waypoint(self._lane, s)]
+        rest = s - self._lane.length
+        result = []
+        for lane in self._lane.successors:
+            result += Waypoint(lane, 0.0).next(rest)
+        return result
+
+    def previous(self, distance):
+        s = self.s - distance
+        if s >= 0.0:
+            return [Waypoint(self._lane, s)]
+        result = []
+        for lane in self._lane.predecessors:
+            result += Waypoint(lane, lane.length).previous(-s)
+        return result
+
+    def next_until_lane_end(self, distance):
+        steps = np.arange(self.s + distance, self._lane.length, distance)
+        result = [Waypoint(self._lane, s) for s in steps]
+        result.append(Waypoint(self._lane, self._lane.length))
+        return result
+
+    def previous_until_lane_start(self, distance):
+        steps = np.arange(self.s - distance, 0.0, -distance)
+        result = [Waypoint(self._lane, s) for s in steps]
+        result.append(Waypoint(self._lane, 0.0))
+        return result
+
+    def get_left_lane(self):
+        left = self._lane.left
+        if left is None:
+            return None
+        return Waypoint(left, left.length - self.s)
+
+    def get_right_lane(self):
+        return None
+
+
+class Map:
+    """
+    Synthetic town: grid of 4-way intersections,
+    each block is a two-way road with one lane per direction,
+    intersections are connected by straight junction lanes
+    """
+
+    # town -> (number of intersections along x, along y)
+    _GRID_SIZE = {
+        "Town01": (3, 3),
+        "Town02": (3, 2),
+        "Town03": (4, 4),
+        "Town04": (5, 3),
+        "Town05": (4, 4),
+    }
+    _BLOCK = 80.  # distance between 2 intersections
+    _JUNCTION = 8.  # distance from intersection center to its border
+    _LANE_WIDTH = 3.5
+
+    def __init__(self, name: str = "Town01"):
+        self.name = name
+        self._grid = self._GRID_SIZE.get(name, (4, 4))
+
+        self._lanes = []
+        # intersection -> list of (incoming lane, outgoing lane of same road)
+        self._intersections = dict()
+        self._build_roads()
+        self._build_junctions()
+        self._build_index()
+        self._waypoint_cache = dict()
+
+    def _get_road_id(self):
+        return len(self._lanes) + 1
+
+    def _build_roads(self):
+        nx, ny = self._grid
+        block, junction, half_width = self._BLOCK, self._JUNCTION, self._LANE_WIDTH / 2
+        for i in range(nx):
+            for j in range(ny):
+                self._intersections[(i, j)] = []
+
+        for i in range(nx):
+            for j in range(ny):
+                a = np.array([i * block, j * block])
+                for b_index in [(i + 1, j), (i, j + 1)]:
+                    if b_index not in self._intersections:
+                        continue
+                    b = np.array(b_index, dtype=np.float64) * block
+                    u = (b - a) / block
+                    r = np.array([-u[1], u[0]])
+                    road_id = self._get_road_id()
+                    forward = _Lane(road_id, -1,
+                                    a + u * junction + r * half_width,
+                                    b - u * junction + r * half_width,
+                                    self._LANE_WIDTH)
+                    backward = _Lane(road_id, 1,
+                                     b - u * junction - r * half_width,
+                                     a + u * junction - r * half_width,
+                                     self._LANE_WIDTH)
+                    forward.left, backward.left = backward, forward
+                    self._lanes += [forward, backward]
+                    # (incoming, outgoing) at each end
+                    self._intersections[b_index].append((forward, backward))
+                    self._intersections[(i, j)].append((backward, forward))
+
+    def _build_junctions(self):
+        for junction_id, (_, arms) in enumerate(self._intersections.items()):
+            for in_lane, reverse_lane in arms:
+                for _, out_lane in arms:
+                    # no u-turn
+                    if out_lane is reverse_lane:
+                        continue
+                    lane = _Lane(self._get_road_id(), -1,
+                                 in_lane.end, out_lane.start,
+                                 self._LANE_WIDTH,
+                                 is_junction=True, junction_id=junction_id)
+                    lane.predecessors.append(in_lane)
+                    lane.successors.append(out_lane)
+                    in_lane.successors.append(lane)
+                    out_lane.predecessors.append(lane)
+                    self._lanes.append(lane)
+
+    def _build_index(self):
+        self._starts = np.array([lane.start for lane in self._lanes])
+        self._directions = np.array([lane.direction for lane in self._lanes])
+        self._lengths = np.array([lane.length for lane in self._lanes])
+        # prefer road lanes over overlapping junction lanes
+        self._penalty = np.array([1e-3 if lane.is_junction else 0. for lane in self._lanes])
+
+    def get_waypoint(self, location, project_to_road=True, lane_type=LaneType.Driving):
+        key = (round(location.x, 3), round(location.y, 3), project_to_road)
+        cached = self._waypoint_cache.get(key)
+        if cached is not None:
+            return Waypoint(*cached)
+
+        point = np.array([location.x, location.y])
+        diff = point - self._starts
+        s = np.clip(np.einsum("ij,ij->i", diff, self._directions), 0., self._lengths)
+        dist = diff - self._directions * s[:, None]
+        dist = np.einsum("ij,ij->i", dist, dist) + self._penalty
+        k = int(np.argmin(dist))
+        if not project_to_road and dist[k] > (self._lanes[k].width / 2) ** 2:
+            return None
+
+        if len(self._waypoint_cache) > 100000:
+            self._waypoint_cache.clear()
+        self._waypoint_cache[key] = (self._lanes[k], s[k])
+        return Waypoint(self._lanes[k], s[k])
+
+    def get_topology(self):
+        return [
+            (Waypoint(lane, 0.), Waypoint(lane, lane.length))
+            for lane in self._lanes
+        ]
+
+    def generate_waypoints(self, distance):
+        return [
+            Waypoint(lane, s)
+            for lane in self._lanes
+            for s in np.arange(0., lane.length, distance)
+        ]
+
+    def get_spawn_points(self):
+        return [
+            Transform(
+                Location(*(lane.start + lane.direction * lane.length * k), 0.3),
+                Rotation(yaw=lane.yaw)
+            )
+            for lane in self._lanes
+            if not lane.is_junction
+            for k in (0.25, 0.5, 0.75)
+        ]
+
+    def get_crosswalks(self):
+        """
+        5 points of closed polygon for each crosswalk,
+        on each road, next to the intersection
+        """
+        locations = []
+        depth = 3.
+        for (i, j), arms in self._intersections.items():
+            center = np.array([i, j], dtype=np.float64) * self._BLOCK
+            for _, out_lane in arms:
+                u = out_lane.direction
+                r = np.array([-u[1], u[0]])
+                near = center + u * (self._JUNCTION - depth)
+                far = center + u * self._JUNCTION
+                corners = [
+                    near - r * self._LANE_WIDTH,
+                    far - r * self._LANE_WIDTH,
+                    far + r * self._LANE_WIDTH,
+                    near + r * self._LANE_WIDTH,
+                    near - r * self._LANE_WIDTH
+                ]
+                locations += [Location(x, y, 0.) for x, y in corners]
+        return locations
+
+    def get_traffic_light_placements(self):
+        """
+        Returns:
+            list(tuple(_Lane, int, int)): incoming lane,
+                intersection index, phase group (0: along x, 1: along y)
+        """
+        placements = []
+        for index, (_, arms) in enumerate(self._intersections.items()):
+            for in_lane, _ in arms:
+                group = 0 if abs(in_lane.direction[0]) > abs(in_lane.direction[1]) else 1
+                placements.append((in_lane, index, group))
+        return placements
+
+    def get_sign_placements(self):
+        """
+        Returns:
+            list(_Lane): lanes to put a speed limit sign at its start
+        """
+        return [
+            lane
+            for lane in self._lanes
+            if not lane.is_junction and lane.lane_id == -1
+        ]
+
+    def to_right(self, lane: _Lane, s: float, offset: float) -> Vector3D:
+        x, y = lane.start + lane.direction * s + np.array([-lane.direction[1], lane.direction[0]]) * offset
+        return Location(x, y, 0.)
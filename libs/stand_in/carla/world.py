@@ -0,0 +1,529 @@
+import re
+import math
+import time
+import fnmatch
+import threading
+from enum import IntEnum
+from functools import lru_cache
+
+from .geometry import Vector3D, Location, Rotation, Transform, BoundingBox
+from .road import Map
+
+
+class TrafficLightState(IntEnum):
+    Red = 0
+    Yellow = 1
+    Green = 2
+    Off = 3
+    Unknown = 4
+
+    def __str__(self):
+        return self.name
+
+
+class VehicleControl:
+    def __init__(self, throttle=0.0, steer=0.0, brake=0.0, hand_brake=False,
+                 reverse=False, manual_gear_shift=False, gear=0):
+        self.throttle = throttle
+        self.steer = steer
+        self.brake = brake
+        self.hand_brake = hand_brake
+        self.reverse = reverse
+        self.manual_gear_shift = manual_gear_shift
+        self.gear = gear
+
+    def __repr__(self):
+        return f"VehicleControl(throttle={self.throttle:.3f}, steer={self.steer:.3f}, brake={self.brake:.3f})"
+
+
+class WorldSettings:
+    def __init__(self, synchronous_mode=False, no_rendering_mode=False, fixed_delta_seconds=None):
+        self.synchronous_mode = synchronous_mode
+        self.no_rendering_mode = no_rendering_mode
+        self.fixed_delta_seconds = fixed_delta_seconds
+
+    def _copy(self):
+        return WorldSettings(self.synchronous_mode, self.no_rendering_mode, self.fixed_delta_seconds)
+
+
+class Timestamp:
+    def __init__(self, frame=0, elapsed_seconds=0.0, delta_seconds=0.0, platform_timestamp=0.0):
+        self.frame = frame
+        self.elapsed_seconds = elapsed_seconds
+        self.delta_seconds = delta_seconds
+        self.platform_timestamp = platform_timestamp
+
+
+class ActorSnapshot:
+    def __init__(self, actor_id, state):
+        self.id = actor_id
+        self._state = state
+
+    def get_transform(self):
+        x, y, z, yaw = self._state[:4]
+        return Transform(Location(x, y, z), Rotation(yaw=yaw))
+
+    def get_velocity(self):
+        return Vector3D(*self._state[4:7])
+
+    def get_angular_velocity(self):
+        return Vector3D()
+
+    def get_acceleration(self):
+        return Vector3D()
+
+
+class WorldSnapshot:
+    def __init__(self, frame, timestamp, states):
+        self.id = frame
+        self.frame = frame
+        self.timestamp = timestamp
+        # actor id -> (x, y, z, yaw, vx, vy, vz)
+        self._states = states
+
+    def find(self, actor_id):
+        state = self._states.get(actor_id)
+        if state is None:
+            return None
+        return ActorSnapshot(actor_id, state)
+
+    def has_actor(self, actor_id):
+        return actor_id in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+    def __iter__(self):
+        return (ActorSnapshot(actor_id, state) for actor_id, state in self._states.items())
+
+
+@lru_cache(maxsize=None)
+def _get_matcher(wildcard_pattern):
+    return re.compile(fnmatch.translate(wildcard_pattern)).match
+
+
+class ActorBlueprint:
+    def __init__(self, blueprint_id, extent):
+        self.id = blueprint_id
+        self.tags = blueprint_id.split(".")
+        self._extent = extent
+
+    def has_tag(self, tag):
+        return tag in self.tags
+
+    def set_attribute(self, key, value):
+        pass
+
+
+class BlueprintLibrary(list):
+    def filter(self, wildcard_pattern):
+        match = _get_matcher(wildcard_pattern)
+        return BlueprintLibrary([bp for bp in self if match(bp.id)])
+
+    def find(self, blueprint_id):
+        for bp in self:
+            if bp.id == blueprint_id:
+                return bp
+        raise IndexError(f"blueprint '{blueprint_id}' not found")
+
+
+class ActorList(list):
+    def __init__(self, actors=()):
+        super().__init__(actors)
+        # pattern -> filtered list, list of actors does not change after creation
+        self._filtered = dict()
+
+    def filter(self, wildcard_pattern):
+        filtered = self._filtered.get(wildcard_pattern)
+        if filtered is None:
+            match = _get_matcher(wildcard_pattern)
+            filtered = ActorList([actor for actor in self if match(actor.type_id)])
+            self._filtered[wildcard_pattern] = filtered
+        return filtered
+
+    def find(self, actor_id):
+        for actor in self:
+            if actor.id == actor_id:
+                return actor
+        return None
+
+
+class Actor:
+    def __init__(self, world, actor_id, type_id, transform, extent):
+        self._world = world
+        self.id = actor_id
+        self.type_id = type_id
+        self.attributes = dict()
+        self.parent = None
+        self.is_alive = True
+        self._x = transform.location.x
+        self._y = transform.location.y
+        self._z = transform.location.z
+        self._yaw = transform.rotation.yaw
+        self._velocity = (0.0, 0.0, 0.0)
+        self._extent = extent
+
+    def _get_state(self):
+        return (self._x, self._y, self._z, self._yaw) + self._velocity
+
+    @property
+    def bounding_box(self):
+        return BoundingBox(Location(0., 0., self._extent.z), Vector3D(self._extent.x, self._extent.y, self._extent.z))
+
+    def get_world(self):
+        return self._world
+
+    def get_transform(self):
+        return Transform(Location(self._x, self._y, self._z), Rotation(yaw=self._yaw))
+
+    def get_location(self):
+        return Location(self._x, self._y, self._z)
+
+    def get_velocity(self):
+        return Vector3D(*self._velocity)
+
+    def get_angular_velocity(self):
+        return Vector3D()
+
+    def get_acceleration(self):
+        return Vector3D()
+
+    def set_transform(self, transform):
+        self._x, self._y, self._z = transform.location.x, transform.location.y, transform.location.z
+        self._yaw = transform.rotation.yaw
+
+    def destroy(self):
+        if not self.is_alive:
+            return False
+        self.is_alive = False
+        self._world._remove_actor(self)
+        return True
+
+
+class Vehicle(Actor):
+    _MAX_ACCELERATION = 4.  # m/s^2
+    _MAX_DECELERATION = 8.  # m/s^2
+    _DRAG = 0.05  # 1/s
+    _WHEELBASE = 2.9  # m
+    _MAX_STEER_ANGLE = math.radians(60.)
+
+    def __init__(self, world, actor_id, type_id, transform, extent):
+        super().__init__(world, actor_id, type_id, transform, extent)
+        self._control = VehicleControl()
+        self._speed = 0.0
+
+    def apply_control(self, control):
+        self._control = control
+
+    def get_control(self):
+        return self._control
+
+    def get_speed_limit(self):
+        return self._world._speed_limit
+
+    def get_traffic_light_state(self):
+        return TrafficLightState.Green
+
+    def is_at_traffic_light(self):
+        return False
+
+    def _step(self, dt):
+        """
+        Kinematic bicycle model
+        """
+        control = self._control
+        if control.hand_brake:
+            acceleration = -self._MAX_DECELERATION
+        else:
+            acceleration = control.throttle * self._MAX_ACCELERATION \
+                - control.brake * self._MAX_DECELERATION \
+                - self._DRAG * self._speed
+        self._speed = max(0.0, self._speed + acceleration * dt)
+
+        yaw = math.radians(self._yaw)
+        yaw += self._speed / self._WHEELBASE * math.tan(control.steer * self._MAX_STEER_ANGLE) * dt
+        cos_yaw, sin_yaw = math.cos(yaw), math.sin(yaw)
+        self._x += self._speed * cos_yaw * dt
+        self._y += self._speed * sin_yaw * dt
+        self._yaw = (math.degrees(yaw) + 180.) % 360. - 180.
+        self._velocity = (self._speed * cos_yaw, self._speed * sin_yaw, 0.0)
+
+
+class TrafficSign(Actor):
+    def __init__(self, world, actor_id, type_id, transform, extent, trigger_volume):
+        super().__init__(world, actor_id, type_id, transform, extent)
+        self.trigger_volume = trigger_volume
+
+
+class TrafficLight(TrafficSign):
+    _GREEN = 10.  # seconds
+    _YELLOW = 3.
+
+    def __init__(self, world, actor_id, type_id, transform, extent, trigger_volume, offset):
+        super().__init__(world, actor_id, type_id, transform, extent, trigger_volume)
+        # time in cycle, lights in the same phase group have the same offset
+        self._offset = offset
+        self._frozen = False
+        self._state = TrafficLightState.Red
+
+    @property
+    def state(self):
+        return self._state
+
+    def get_state(self):
+        return self._state
+
+    def set_state(self, state):
+        self._state = state
+
+    def freeze(self, freeze):
+        self._frozen = freeze
+
+    def is_frozen(self):
+        return self._frozen
+
+    def _update(self, elapsed):
+        if self._frozen:
+            return
+        period = 2 * (self._GREEN + self._YELLOW)
+        t = (elapsed + self._offset) % period
+        if t < self._GREEN:
+            self._state = TrafficLightState.Green
+        elif t < self._GREEN + self._YELLOW:
+            self._state = TrafficLightState.Yellow
+        else:
+            self._state = TrafficLightState.Red
+
+
+class DebugHelper:
+    def __getattr__(self, name):
+        # draw_point, draw_arrow, draw_string... are no-op
+        def _draw(*args, **kwargs):
+            pass
+        return _draw
+
+
+class World:
+    _VEHICLE_EXTENT = {
+        "vehicle.tesla.model3": Vector3D(2.4, 1.05, 0.75),
+        "vehicle.kawasaki.ninja": Vector3D(1.0, 0.4, 0.75),
+        "vehicle.audi.a2": Vector3D(1.85, 0.9, 0.75),
+        "vehicle.gazelle.omafiets": Vector3D(0.9, 0.3, 0.9),
+        "walker.pedestrian.0025": Vector3D(0.2, 0.2, 0.9),
+    }
+    _ASYNC_DELTA = 0.05  # seconds per frame when server runs by itself
+
+    def __init__(self, client, map_name):
+        self._client = client
+        self.id = id(self)
+        self.debug = DebugHelper()
+        self._map = Map(map_name)
+        self._speed_limit = 50.  # km/h
+
+        self._lock = threading.RLock()
+        self._settings = WorldSettings()
+        self._actors = dict()
+        self._vehicles = dict()
+        # shared list of all actors, rebuilt when actors change
+        self._actor_list = None
+        self._next_id = 1
+        self._frame = 0
+        self._elapsed = 0.0
+        self._delta = 0.0
+        self._snapshot = None
+
+        self._spawn_map_actors()
+        self._take_snapshot()
+        # started by client, once world is its current world
+        self._ticker = None
+
+    def _get_id(self):
+        actor_id = self._next_id
+        self._next_id += 1
+        return actor_id
+
+    def _spawn_map_actors(self):
+        extent = Vector3D(0.5, 0.5, 2.)
+        # traffic lights on the right of stop line of incoming lanes
+        for lane, index, group in self._map.get_traffic_light_placements():
+            width = lane.width
+            location = self._map.to_right(lane, lane.length, width)
+            transform = Transform(location, Rotation(yaw=lane.yaw))
+            # trigger volume on the lane, 2m before stop line
+            trigger = BoundingBox(Location(-2., -width, 0.), Vector3D(1., width / 2, 1.))
+            offset = 3. * index + group * (TrafficLight._GREEN + TrafficLight._YELLOW)
+            light = TrafficLight(self, self._get_id(), "traffic.traffic_light",
+                                 transform, extent, trigger, offset)
+            light._update(0.)
+            self._actors[light.id] = light
+        # speed limit signs at the beginning of roads
+        for i, lane in enumerate(self._map.get_sign_placements()):
+            location = self._map.to_right(lane, min(5., lane.length), lane.width)
+            transform = Transform(location, Rotation(yaw=lane.yaw))
+            sign = TrafficSign(self, self._get_id(), f"traffic.speed_limit.{[30, 60, 90][i % 3]}",
+                               transform, extent, BoundingBox(Location(), Vector3D(1., 1., 1.)))
+            self._actors[sign.id] = sign
+        self._static_states = {
+            actor_id: actor._get_state()
+            for actor_id, actor in self._actors.items()
+        }
+
+    def _start_ticker(self):
+        """
+        In asynchronous mode, server moves by itself in real time
+        """
+        if self._settings.synchronous_mode or self._ticker is not None:
+            return
+        self._ticker = threading.Thread(target=self._run_ticker, daemon=True)
+        self._ticker.start()
+
+    def _run_ticker(self):
+        while not self._settings.synchronous_mode and self._client._world is self:
+            start = time.time()
+            self._step(self._ASYNC_DELTA)
+            time.sleep(max(0.0, self._ASYNC_DELTA - (time.time() - start)))
+        self._ticker = None
+
+    def _step(self, dt):
+        with self._lock:
+            for vehicle in self._vehicles.values():
+                vehicle._step(dt)
+            self._elapsed += dt
+            self._delta = dt
+            self._frame += 1
+            for actor in self._actors.values():
+                if isinstance(actor, TrafficLight):
+                    actor._update(self._elapsed)
+            self._take_snapshot()
+        return self._frame
+
+    def _take_snapshot(self):
+        states = dict(self._static_states)
+        for actor_id, vehicle in self._vehicles.items():
+            states[actor_id] = vehicle._get_state()
+        timestamp = Timestamp(self._frame, self._elapsed, self._delta, time.time())
+        self._snapshot = WorldSnapshot(self._frame, timestamp, states)
+
+    def _remove_actor(self, actor):
+        with self._lock:
+            self._actors.pop(actor.id, None)
+            self._vehicles.pop(actor.id, None)
+            self._actor_list = None
+            self._static_states.pop(actor.id, None)
+
+    def get_map(self):
+        return self._map
+
+    def get_blueprint_library(self):
+        return BlueprintLibrary([
+            ActorBlueprint(bp_id, extent)
+            for bp_id, extent in self._VEHICLE_EXTENT.items()
+        ])
+
+    def get_actors(self, actor_ids=None):
+        with self._lock:
+            if self._actor_list is None:
+                self._actor_list = ActorList(self._actors.values())
+            actors = self._actor_list
+        if actor_ids is not None:
+            actor_ids = set(actor_ids)
+            actors = [actor for actor in actors if actor.id in actor_ids]
+        return ActorList(actors)
+
+    def get_actor(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        actor = self.try_spawn_actor(blueprint, transform, attach_to)
+        if actor is None:
+            raise RuntimeError("Spawn failed because of collision at spawn position")
+        return actor
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        with self._lock:
+            for vehicle in self._vehicles.values():
+                if vehicle.get_location().distance(transform.location) < blueprint._extent.x:
+                    return None
+            vehicle = Vehicle(self, self._get_id(), blueprint.id, transform, blueprint._extent)
+            self._actors[vehicle.id] = vehicle
+            self._vehicles[vehicle.id] = vehicle
+            self._actor_list = None
+        return vehicle
+
+    def get_snapshot(self):
+        return self._snapshot
+
+    def get_settings(self):
+        return self._settings._copy()
+
+    def apply_settings(self, settings):
+        self._settings = settings._copy()
+        self._start_ticker()
+        return self._frame
+
+    def tick(self, seconds=10.0):
+        dt = self._settings.fixed_delta_seconds
+        return self._step(dt if dt is not None else self._ASYNC_DELTA)
+
+    def wait_for_tick(self, seconds=10.0):
+        if self._settings.synchronous_mode:
+            return self._snapshot
+        frame = self._frame
+        deadline = time.time() + seconds
+        while self._frame == frame:
+            if time.time() > deadline:
+                raise RuntimeError("time-out while waiting for the simulator")
+            time.sleep(0.001)
+        return self._snapshot
+
+    def on_tick(self, callback):
+        return 0
+
+
+class Client:
+    def __init__(self, host="127.0.0.1", port=2000, worker_threads=0):
+        self.host = host
+        self.port = port
+        self._timeout = 10.
+        self._world = None
+
+    def set_timeout(self, seconds):
+        self._timeout = seconds
+
+    def get_client_version(self):
+        return "0.9.11"
+
+    def get_server_version(self):
+        return "0.9.11"
+
+    def get_available_maps(self):
+        return [f"/Game/Carla/Maps/{name}" for name in Map._GRID_SIZE]
+
+    def load_world(self, map_name, reset_settings=True):
+        # previous world stops its ticker
+        self._world = None
+        self._world = World(self, map_name)
+        self._world._start_ticker()
+        return self._world
+
+    def apply_batch(self, commands):
+        self.apply_batch_sync(commands)
+
+    def apply_batch_sync(self, commands, due_tick_cue=False):
+        """
+        Apply all commands in one call
+        Returns:
+            (list(command.Response)): one per command, in order
+        """
+        world = self.get_world()
+        with world._lock:
+            responses = [cmd._apply(world) for cmd in commands]
+        if due_tick_cue and world._settings.synchronous_mode:
+            world.tick()
+        return responses
+
+    def get_world(self):
+        if self._world is None:
+            self._world = World(self, "Town01")
+            self._world._start_ticker()
+        return self._world
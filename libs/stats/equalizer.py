@@ -1,10 +1,10 @@
-import glob
 import os.path
 import shutil
-import pandas as pd
 import numpy as np
 
-from stats.utils import get_turning, get_velocity
+from stats.utils import get_turning, get_velocity, get_status
+from common.table_io import read_table, list_tables
+from common.timing import timeit
 
 
 class Equalizer:
@@ -18,7 +18,7 @@ class Equalizer:
         Args:
             folder_path (str): should be path to dynamics_by_ts folder
         """
-        self._list_file = glob.glob(f"{folder_path}/*.csv")
+        self._list_file = list_tables(folder_path)
         self.container = {
             "left": list(),
             "right": list(),
@@ -27,6 +27,7 @@ class Equalizer:
         }
         self._do_turning_direction_stats()
 
+    @timeit("stats.turning_direction")
     def _do_turning_direction_stats(self):
         """
         Do examine in turning direction for AGENT
@@ -38,13 +39,14 @@ class Equalizer:
             (None)
         """
         for file_path in self._list_file:
-            df = pd.read_csv(file_path)
+            df = read_table(file_path)
             df_agent = df.loc[df["object_type"] == "AGENT"]
 
-            avg_vel = get_velocity(df_agent["status"])
+            avg_vel = get_velocity(get_status(df_agent))
             turn_dir = get_turning(df_agent["heading"], avg_vel)
             self.container[turn_dir].append(file_path)
 
+    @timeit("stats.equalize")
     def run(
             self,
             save_folder: str
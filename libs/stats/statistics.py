@@ -1,11 +1,11 @@
-import glob
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 
 from tqdm import tqdm
 from typing import Dict
-from stats.utils import get_velocity, get_turning
+from stats.utils import get_velocity, get_turning, get_status
+from common.table_io import read_table, list_tables
+from common.timing import TIMINGS, timeit
 
 
 class Statistics:
@@ -13,9 +13,10 @@ class Statistics:
             self,
             dynamics_folder: str
     ):
-        self._list_dynamics = glob.glob(f"{dynamics_folder}/*.csv")
+        self._list_dynamics = list_tables(dynamics_folder)
         self._statistic_result = self.stats()
 
+    @timeit("stats.stats")
     def stats(self) -> Dict:
         """
         Do statistics about
@@ -37,12 +38,13 @@ class Statistics:
         }
 
         for dynamic_file in tqdm(self._list_dynamics):
-            df = pd.read_csv(dynamic_file)
+            with TIMINGS.measure("stats.read", verbose=False):
+                df = read_table(dynamic_file)
             # stats by individual instance
             df_agent = df.loc[df["object_type"] == "AGENT"]
             # get heading and status of instance
             heading = df_agent["heading"]
-            status = df_agent["status"]
+            status = get_status(df_agent)
 
             avg_vel = get_velocity(status)
             turn_dir = get_turning(heading, avg_vel)
@@ -11,12 +11,17 @@ def get_velocity(
     """
     Get average velocity of vehicle in one scene
     Args:
-        status (pd.Series): series status of vehicle in scene
+        status (pd.Series): series velocity of vehicle in scene,
+            or series json status for data with "status" column
 
     Returns:
         (float): average velocity of vehicle in scene
 
     """
+    # typed velocity column
+    if pd.api.types.is_numeric_dtype(status):
+        return float(np.nanmean(status.to_numpy(dtype=np.float64)))
+
     # get average velocity
     avg_vel = list()
     for _row in status:
@@ -25,6 +30,22 @@ def get_velocity(
     return float(avg_vel)
 
 
+def get_status(
+        df: pd.DataFrame
+) -> pd.Series:
+    """
+    Get series to estimate velocity from
+    Args:
+        df (pd.DataFrame): data of vehicle in scene
+
+    Returns:
+        (pd.Series): "velocity" column if available, otherwise json "status"
+    """
+    if "velocity" in df.columns:
+        return df["velocity"]
+    return df["status"]
+
+
 def get_turning(
         heading: pd.Series,
         avg_vel: float
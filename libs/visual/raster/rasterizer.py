@@ -0,0 +1,300 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.table_io import read_table, find_table
+
+RASTER_FILE_NAME = "static_raster.npz"
+
+# RGB of static layers, drawn in this order
+LAYER_COLORS = {
+    "crosswalk": (0, 255, 255),
+    "l_lane": (0, 0, 128),
+    "r_lane": (0, 0, 255),
+    "waypoint": (0, 255, 0),
+}
+SIGN_COLOR = (255, 0, 0)  # any other type of static table is a traffic sign
+SIGN_RADIUS = 2.  # in meters, same as matplot Figure
+
+
+def _fill_polygon(
+        image: np.ndarray,
+        polygon: np.ndarray,
+        color: tuple
+):
+    """
+    Fill polygon (even-odd rule), only pixels of its bounding box are tested
+    Args:
+        image (np.ndarray): shape (H, W, 3)
+        polygon (np.ndarray): shape (N, 2), col, row of vertices in pixel
+        color (tuple): RGB
+    """
+    height, width = image.shape[:2]
+    c0, r0 = np.maximum(np.floor(polygon.min(axis=0)).astype(np.int64), 0)
+    c1, r1 = np.minimum(np.ceil(polygon.max(axis=0)).astype(np.int64) + 1, (width, height))
+    if c0 >= c1 or r0 >= r1:
+        return
+    cols, rows = np.meshgrid(np.arange(c0, c1) + 0.5, np.arange(r0, r1) + 0.5)
+    is_inside = np.zeros(cols.shape, dtype=bool)
+    for (xa, ya), (xb, yb) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if ya == yb:
+            continue
+        crosses = (ya > rows) != (yb > rows)
+        is_inside ^= crosses & (cols < xa + (rows - ya) * (xb - xa) / (yb - ya))
+    image[r0:r1, c0:c1][is_inside] = color
+
+
+class Rasterizer:
+    """
+    Headless bird's-eye-view rasterizer, numpy only
+    Static layers are drawn once into a canvas over the whole town,
+    each frame is a rotated crop of this canvas (one gather), with boxes of dynamic objects on top
+    rasterizer = Rasterizer(static)  # or Rasterizer.from_folder(batch_folder)
+    image = rasterizer.render(center=(x, y), heading=yaw, boxes=boxes, colors=colors)
+    Image is centered at center, heading points up, its right is the right of the agent
+    """
+
+    def __init__(
+            self,
+            static: pd.DataFrame,
+            resolution: float = 0.2,
+            margin: float = 50.,
+            line_width: int = 1
+    ):
+        """
+        Args:
+            static (pd.DataFrame): static table, see Map.get_dataframe(), needs id, type, x, y
+            resolution (float): meters per pixel, of canvas and crops
+            margin (float): in meters, empty border around the map
+            line_width (int): width of lanes in pixel
+        """
+        if resolution <= 0:
+            raise ValueError(f"resolution should be positive, got {resolution}")
+        self.resolution = float(resolution)
+        xy = static[["x", "y"]].to_numpy(dtype=np.float64)
+        low = xy.min(axis=0) if len(xy) > 0 else np.zeros(2)
+        high = xy.max(axis=0) if len(xy) > 0 else np.zeros(2)
+        self._origin = low - margin
+        width, height = np.ceil((high - low + 2 * margin) / self.resolution).astype(np.int64) + 1
+        self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        # pixel offsets of output grid, by size of crop
+        self._grids = dict()
+
+        self._draw_static(static, line_width)
+
+    def _to_pixel(self, xy: np.ndarray) -> np.ndarray:
+        # x -> column, y -> row, as seen from above in carla (y points to the right of x)
+        return (xy - self._origin) / self.resolution
+
+    def _draw_static(self, static: pd.DataFrame, line_width: int):
+        ids = static["id"].to_numpy()
+        types = static["type"].astype(str).to_numpy()
+        pixels = self._to_pixel(static[["x", "y"]].to_numpy(dtype=np.float64))
+
+        # crosswalks are filled, one polygon per id
+        is_crosswalk = types == "crosswalk"
+        for crosswalk_id in np.unique(ids[is_crosswalk]):
+            _fill_polygon(self.canvas, pixels[is_crosswalk & (ids == crosswalk_id)], LAYER_COLORS["crosswalk"])
+
+        # lanes and waypoints are drawn as lines between consecutive points of the same id
+        for layer in ["l_lane", "r_lane", "waypoint"]:
+            is_layer = types == layer
+            self._draw_lines(pixels[is_layer], ids[is_layer], LAYER_COLORS[layer], line_width)
+
+        # traffic signs are discs
+        is_sign = ~np.isin(types, list(LAYER_COLORS))
+        radius = SIGN_RADIUS / self.resolution
+        for col, row in pixels[is_sign]:
+            circle = np.linspace(0, 2 * np.pi, 16, endpoint=False)
+            _fill_polygon(
+                self.canvas,
+                np.stack([col + radius * np.cos(circle), row + radius * np.sin(circle)], axis=1),
+                SIGN_COLOR
+            )
+
+    def _draw_lines(
+            self,
+            pixels: np.ndarray,
+            ids: np.ndarray,
+            color: tuple,
+            line_width: int
+    ):
+        """
+        Draw all polylines of a layer at once,
+        each segment is sampled every half pixel
+        """
+        if len(pixels) < 2:
+            return
+        is_segment = ids[1:] == ids[:-1]
+        starts = pixels[:-1][is_segment]
+        ends = pixels[1:][is_segment]
+        num_samples = np.ceil(np.linalg.norm(ends - starts, axis=1) * 2).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(starts)), num_samples)
+        t = (np.arange(len(segment)) - np.repeat(np.cumsum(num_samples) - num_samples, num_samples)) \
+            / np.maximum(np.repeat(num_samples, num_samples) - 1, 1)
+        points = starts[segment] + (ends[segment] - starts[segment]) * t[:, None]
+
+        # thicker lines are drawn as shifted copies
+        offsets = np.arange(line_width) - (line_width - 1) / 2
+        height, width = self.canvas.shape[:2]
+        for dc in offsets:
+            for dr in offsets:
+                cols = np.floor(points[:, 0] + dc).astype(np.int64)
+                rows = np.floor(points[:, 1] + dr).astype(np.int64)
+                is_valid = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+                self.canvas[rows[is_valid], cols[is_valid]] = color
+
+    def _get_grid(self, size: tuple) -> tuple:
+        # forward / right distance of each output pixel to center, in meters
+        grid = self._grids.get(size)
+        if grid is None:
+            height, width = size
+            rows, cols = np.meshgrid(np.arange(height), np.arange(width), indexing="ij")
+            forward = ((height - 1) / 2 - rows).ravel() * self.resolution
+            right = (cols - (width - 1) / 2).ravel() * self.resolution
+            grid = self._grids[size] = (forward, right)
+        return grid
+
+    def crop(
+            self,
+            center,
+            heading: float,
+            size: tuple = (224, 224)
+    ) -> np.ndarray:
+        """
+        Static layers around center, rotated so that heading points up
+        Args:
+            center (tuple(float) | np.ndarray): x, y in meters
+            heading (float): in radians
+            size (tuple(int)): height, width in pixel
+
+        Returns:
+            (np.ndarray): shape (height, width, 3), uint8
+        """
+        size = tuple(size)
+        forward, right = self._get_grid(size)
+        cos_h, sin_h = np.cos(heading), np.sin(heading)
+        x = center[0] + forward * cos_h - right * sin_h
+        y = center[1] + forward * sin_h + right * cos_h
+        cols = np.floor((x - self._origin[0]) / self.resolution).astype(np.int64)
+        rows = np.floor((y - self._origin[1]) / self.resolution).astype(np.int64)
+        height, width = self.canvas.shape[:2]
+        is_valid = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+
+        image = self.canvas[np.where(is_valid, rows, 0), np.where(is_valid, cols, 0)]
+        image[~is_valid] = 0
+        return image.reshape(size + (3,))
+
+    def draw_boxes(
+            self,
+            image: np.ndarray,
+            center,
+            heading: float,
+            boxes: np.ndarray,
+            colors: np.ndarray
+    ):
+        """
+        Draw rotated boxes of dynamic objects into a crop, in place
+        Args:
+            image (np.ndarray): crop returned by crop(center, heading)
+            center (tuple(float) | np.ndarray): same as crop
+            heading (float): same as crop
+            boxes (np.ndarray): shape (N, 5), center_x, center_y, heading, length, width of objects
+            colors (np.ndarray): shape (N, 3), RGB of each box
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape((-1, 5))
+        if len(boxes) == 0:
+            return
+        height, width = image.shape[:2]
+        # corners of all boxes in world: (N, 4, 2)
+        half = boxes[:, 3:5, None] / 2 * np.array([[1, 1, -1, -1], [1, -1, -1, 1]])
+        cos_b, sin_b = np.cos(boxes[:, 2:3]), np.sin(boxes[:, 2:3])
+        x = boxes[:, 0:1] + half[:, 0] * cos_b - half[:, 1] * sin_b
+        y = boxes[:, 1:2] + half[:, 0] * sin_b + half[:, 1] * cos_b
+
+        # world -> forward / right of crop center -> pixel
+        dx, dy = x - center[0], y - center[1]
+        cos_h, sin_h = np.cos(heading), np.sin(heading)
+        forward = dx * cos_h + dy * sin_h
+        right = -dx * sin_h + dy * cos_h
+        corners = np.stack([
+            right / self.resolution + (width - 1) / 2 + 0.5,
+            (height - 1) / 2 - forward / self.resolution + 0.5
+        ], axis=2)
+
+        # boxes out of crop are skipped
+        is_visible = (corners[:, :, 0].max(axis=1) >= 0) & (corners[:, :, 0].min(axis=1) < width) \
+            & (corners[:, :, 1].max(axis=1) >= 0) & (corners[:, :, 1].min(axis=1) < height)
+        for polygon, color in zip(corners[is_visible], np.asarray(colors)[is_visible]):
+            _fill_polygon(image, polygon, color)
+
+    def render(
+            self,
+            center,
+            heading: float,
+            boxes: np.ndarray = None,
+            colors: np.ndarray = None,
+            size: tuple = (224, 224)
+    ) -> np.ndarray:
+        """
+        Crop of static layers with dynamic objects, see crop() and draw_boxes()
+        Returns:
+            (np.ndarray): shape (height, width, 3), uint8
+        """
+        image = self.crop(center, heading, size)
+        if boxes is not None:
+            self.draw_boxes(image, center, heading, boxes, colors)
+        return image
+
+    def save(self, folder_path: str) -> str:
+        """
+        Save canvas next to static table
+        Returns:
+            (str): path of saved canvas
+        """
+        file_path = f"{folder_path}/{RASTER_FILE_NAME}"
+        np.savez_compressed(file_path, canvas=self.canvas, origin=self._origin, resolution=self.resolution)
+        return file_path
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Args:
+            file_path (str): canvas saved by save()
+
+        Returns:
+            (Rasterizer)
+        """
+        rasterizer = cls.__new__(cls)
+        with np.load(file_path, allow_pickle=False) as f:
+            rasterizer.canvas = f["canvas"]
+            rasterizer._origin = f["origin"]
+            rasterizer.resolution = float(f["resolution"])
+        rasterizer._grids = dict()
+        return rasterizer
+
+    @classmethod
+    def from_folder(
+            cls,
+            folder_path: str,
+            resolution: float = 0.2
+    ):
+        """
+        Load canvas of a batch (or all_batches) folder,
+        drawn from its static table and saved if not saved yet (or at another resolution)
+        Args:
+            folder_path (str): folder containing static table
+            resolution (float): meters per pixel
+
+        Returns:
+            (Rasterizer)
+        """
+        file_path = f"{folder_path}/{RASTER_FILE_NAME}"
+        if os.path.exists(file_path):
+            rasterizer = cls.load(file_path)
+            if rasterizer.resolution == resolution:
+                return rasterizer
+        rasterizer = cls(read_table(find_table(folder_path, "static")), resolution)
+        rasterizer.save(folder_path)
+        return rasterizer
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image  # installed with matplotlib
+
+from visual.raster.rasterizer import Rasterizer
+from common.table_io import read_table, find_table, list_tables
+from common.timing import TIMINGS
+
+# RGB of dynamic objects by role in converted scene
+ROLE_COLORS = {
+    "AGENT": (255, 0, 0),
+    "AV": (255, 255, 0),
+    "OTHERS": (255, 0, 255),
+}
+IMAGE_FORMATS = ["jpeg", "png", "npz"]
+
+
+def rasterize_scene(
+        rasterizer: Rasterizer,
+        scene: pd.DataFrame,
+        dynamic_property: pd.DataFrame,
+        save_path: str,
+        size: tuple = (224, 224),
+        image_format: str = "jpeg"
+) -> int:
+    """
+    One image per timestamp of a converted scene, centered at AGENT and rotated by its heading
+    Args:
+        rasterizer (Rasterizer): static canvas of town
+        scene (pd.DataFrame): scene in Argoverse format, see convertor.process.set_roles_process()
+        dynamic_property (pd.DataFrame): width and length of objects
+        save_path (str): folder of images (jpeg, png), or path without extension of array (npz)
+        size (tuple(int)): height, width in pixel
+        image_format (str): jpeg, png, or npz (one array (T, height, width, 3) per scene)
+
+    Returns:
+        (int): number of images
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"unknown image format {image_format}, should be one of {IMAGE_FORMATS}")
+    scene = scene.merge(dynamic_property[["id", "width", "length"]], on="id", how="left")
+    scene = scene.sort_values("timestamp", kind="stable")
+    timestamps = scene["timestamp"].to_numpy()
+    boxes = scene[["center_x", "center_y", "heading", "length", "width"]].to_numpy(dtype=np.float64)
+    roles = scene["object_type"].to_numpy()
+    colors = np.array([ROLE_COLORS.get(role, ROLE_COLORS["OTHERS"]) for role in roles], dtype=np.uint8)
+
+    # rows of each timestamp are one range, since scene is sorted
+    frame_starts = np.flatnonzero(np.r_[True, timestamps[1:] != timestamps[:-1]])
+    frame_ends = np.r_[frame_starts[1:], len(timestamps)]
+    images = []
+    for start, end in zip(frame_starts, frame_ends):
+        agent_rows = start + np.flatnonzero(roles[start:end] == "AGENT")
+        if len(agent_rows) == 0:
+            continue
+        agent_x, agent_y, agent_heading = boxes[agent_rows[0], :3]
+        images.append(rasterizer.render(
+            center=(agent_x, agent_y),
+            heading=agent_heading,
+            boxes=boxes[start:end],
+            colors=colors[start:end],
+            size=size
+        ))
+
+    if image_format == "npz":
+        np.savez_compressed(save_path, images=np.stack(images) if images else np.zeros((0,) + tuple(size) + (3,)))
+        return len(images)
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    for i, image in enumerate(images):
+        Image.fromarray(image).save(f"{save_path}/{i:08d}.{image_format}")
+    return len(images)
+
+
+def rasterize_scenes(
+        all_batches_folder: str,
+        resolution: float = 0.2,
+        size: tuple = (224, 224),
+        image_format: str = "jpeg"
+):
+    """
+    Rasterize all converted scenes of {all_batches_folder}/dynamic_by_ts
+    into {all_batches_folder}/images/<scene name>
+    Static canvas is drawn once and saved next to static table
+    Args:
+        all_batches_folder (str): output folder of ConvertToArgoverse / OnlineConvertor
+        resolution (float): meters per pixel
+        size (tuple(int)): height, width in pixel
+        image_format (str): jpeg, png or npz
+    """
+    with TIMINGS.measure("raster.static", verbose=True):
+        rasterizer = Rasterizer.from_folder(all_batches_folder, resolution)
+    dynamic_property = read_table(find_table(all_batches_folder, "dynamic_property"))
+
+    images_folder = f"{all_batches_folder}/images"
+    if not os.path.exists(images_folder):
+        os.makedirs(images_folder)
+    num_images = 0
+    with TIMINGS.measure("raster.scenes", verbose=True):
+        for scene_path in list_tables(f"{all_batches_folder}/dynamic_by_ts"):
+            scene_name = os.path.splitext(os.path.basename(scene_path))[0]
+            num_images += rasterize_scene(
+                rasterizer,
+                read_table(scene_path),
+                dynamic_property,
+                f"{images_folder}/{scene_name}",
+                size,
+                image_format
+            )
+    print(f"rasterized {num_images} images into {images_folder}")